@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import signal
+
+from app.config import load_settings
+from app.db.trade_manager import init_db
+from app.engine import main_engine
+from app.logger import setup_logger
+from app.signals import set_signal_sink
+from app.trade_manager.ingest import SignalHandoff
+from app.trade_manager.lifecycle import run_trade_manager
+
+# Combined runner for small deployments: signal engine + trade manager in one
+# process. Signals are still written to signals.db first, then handed to the
+# trade manager in memory, so there is no polling delay. The split deployment
+# (app.main + app.trade_manager.main) is unchanged.
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Bybit H4 Engine + Trade Manager (single process)")
+    p.add_argument("--timeframe", type=str, default=None, help="e.g. 240 for H4")
+    p.add_argument("--force-universe-refresh", action="store_true", help="Rebuild universe cache")
+    p.add_argument("--log-level", type=str, default=None, help="INFO/DEBUG/WARNING/ERROR")
+    return p
+
+
+async def _run(args) -> None:
+    settings = load_settings(require_keys=False)
+    log = setup_logger("trade_manager")
+    # SIGTERM -> cancellation, so the trade manager's loops run their cleanup
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+    await init_db()
+
+    handoff = SignalHandoff()
+    set_signal_sink(handoff.push)
+    try:
+        await asyncio.gather(
+            main_engine(
+                settings=settings,
+                timeframe_override=str(args.timeframe or getattr(settings, "timeframe", "240")),
+                log_level_override=args.log_level or getattr(settings, "log_level", "INFO"),
+                force_universe_refresh=bool(args.force_universe_refresh),
+            ),
+            run_trade_manager(once=False, log=log, handoff=handoff),
+        )
+    finally:
+        set_signal_sink(None)
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    try:
+        asyncio.run(_run(args))
+    except asyncio.CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
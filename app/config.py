@@ -34,6 +34,15 @@ def _env_float(key: str, default: float) -> float:
         raise RuntimeError(f"Invalid float for {key}: {raw}") from e
 
 
+def _env_bool(key: str, default: bool) -> bool:
+    raw = os.getenv(key, "1" if default else "0").strip().lower()
+    if raw in {"1", "true", "yes", "on"}:
+        return True
+    if raw in {"0", "false", "no", "off", ""}:
+        return False
+    raise RuntimeError(f"Invalid bool for {key}: {raw}")
+
+
 @dataclass(frozen=True)
 class Settings:
     # Bybit
@@ -46,6 +55,9 @@ class Settings:
     min_turnover_24h: float
     max_symbols: int
 
+    # Signals
+    signals_idempotent: bool  # skip re-inserting (symbol, timeframe, date, signal_type)
+
     # Paths
     root_dir: Path
     db_dir: Path
@@ -53,6 +65,7 @@ class Settings:
     indicators_db: Path
     signals_db: Path
     trade_manager_db: Path
+    signals_notify_sock: Path  # engine -> trade manager wakeup datagrams
     logs_dir: Path
 
 
@@ -85,11 +98,13 @@ def load_settings(require_keys: bool = False) -> Settings:
         timeframe=timeframe,
         min_turnover_24h=_env_float("MIN_TURNOVER_24H", 5_000_000),
         max_symbols=_env_int("MAX_SYMBOLS", 300),
+        signals_idempotent=_env_bool("SIGNALS_IDEMPOTENT", False),
         root_dir=root_dir,
         db_dir=db_dir,
         prices_db=db_dir / "prices.db",
         indicators_db=db_dir / "indicators.db",
         signals_db=db_dir / "signals.db",
         trade_manager_db=db_dir / "trade_manager.db",
+        signals_notify_sock=db_dir / "signals.sock",
         logs_dir=logs_dir,
     )
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 import aiosqlite
 
 from app.config import load_settings
+from app.signal_notify import notify_new_signal
 from app.timeutil import now_utc_s
 
 
@@ -12,10 +14,48 @@ from app.timeutil import now_utc_s
 # (symbol, timeframe, date, signal_type, side, entry, stop, tp, created_at)
 SignalRow = Tuple[str, str, int, str, str, float, float, float, int]
 
+# Idempotent mode: keys recently inserted (or found to exist) by this process,
+# per signals db path, so repeated cycles can skip the DB round-trip entirely.
+RECENT_KEYS_MAX = 20_000
+_recent_keys: "Dict[str, OrderedDict[str, None]]" = {}
+
+# Signals db paths whose schema/dedup index this process already ensured.
+_schema_ready: "set[str]" = set()
+
+
+def build_signal_dedup_key(symbol: str, timeframe: str, date: int, signal_type: str) -> str:
+    return f"{symbol}:{timeframe}:{int(date)}:{signal_type}"
+
+
+def _remember_key(db_path: str, key: str) -> None:
+    keys = _recent_keys.setdefault(db_path, OrderedDict())
+    keys[key] = None
+    keys.move_to_end(key)
+    while len(keys) > RECENT_KEYS_MAX:
+        keys.popitem(last=False)
+
+
+async def _ensure_dedup_key(conn: aiosqlite.Connection) -> None:
+    """
+    Add nullable dedup_key column + unique index.
+    Raw rows keep dedup_key NULL (NULLs never collide), idempotent rows set it.
+    """
+    cur = await conn.execute("PRAGMA table_info(signals)")
+    cols = {r[1] for r in await cur.fetchall()}
+    if "dedup_key" not in cols:
+        await conn.execute("ALTER TABLE signals ADD COLUMN dedup_key TEXT")
+    await conn.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_signals_dedup_key
+        ON signals(dedup_key)
+        """
+    )
+
 
 async def _ensure_signals_schema(conn: aiosqlite.Connection) -> None:
     """
-    Ensure signals table is raw append-only (duplicates allowed).
+    Ensure signals table is raw append-only (duplicates allowed),
+    with an opt-in dedup_key unique index for idempotent inserts.
     """
     cur = await conn.execute(
         "SELECT sql FROM sqlite_master WHERE type='table' AND name='signals'"
@@ -39,6 +79,7 @@ async def _ensure_signals_schema(conn: aiosqlite.Connection) -> None:
             ON signals(created_at)
             """
         )
+        await _ensure_dedup_key(conn)
         await conn.commit()
         return
 
@@ -103,18 +144,22 @@ async def _ensure_signals_schema(conn: aiosqlite.Connection) -> None:
             ON signals(created_at)
             """
         )
+        await _ensure_dedup_key(conn)
         await conn.commit()
     except Exception:
         await conn.rollback()
         raise
 
 
-async def _connect() -> aiosqlite.Connection:
-    s = load_settings(require_keys=False)
-    conn = await aiosqlite.connect(s.signals_db)
+async def _connect(db_path: Optional[str] = None) -> aiosqlite.Connection:
+    if db_path is None:
+        db_path = str(load_settings(require_keys=False).signals_db)
+    conn = await aiosqlite.connect(db_path)
     await conn.execute("PRAGMA journal_mode=WAL;")
     await conn.execute("PRAGMA synchronous=NORMAL;")
-    await _ensure_signals_schema(conn)
+    if db_path not in _schema_ready:
+        await _ensure_signals_schema(conn)
+        _schema_ready.add(db_path)
     return conn
 
 
@@ -128,52 +173,132 @@ async def insert_signal(
     stop: float,
     tp: float,
     extra: Optional[Dict[str, float]] = None,
+    idempotent: Optional[bool] = None,
 ) -> bool:
     """
-    Insert raw signal row (duplicates allowed by design).
-    Return True if inserted.
+    Insert signal row. Return True if inserted.
+
+    idempotent=False: raw append (duplicates allowed by design).
+    idempotent=True: skip if (symbol, timeframe, date, signal_type) already exists.
+    idempotent=None: follow SIGNALS_IDEMPOTENT setting.
+    """
+    row = await insert_signal_row(
+        symbol=symbol,
+        timeframe=timeframe,
+        date=date,
+        signal_type=signal_type,
+        side=side,
+        entry=entry,
+        stop=stop,
+        tp=tp,
+        extra=extra,
+        idempotent=idempotent,
+    )
+    return row is not None
+
+
+async def insert_signal_row(
+    symbol: str,
+    timeframe: str,
+    date: int,
+    signal_type: str,
+    side: str,
+    entry: float,
+    stop: float,
+    tp: float,
+    extra: Optional[Dict[str, float]] = None,
+    idempotent: Optional[bool] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Same as insert_signal, but return the inserted row with its id, in the
+    shape the trade manager ingests (see fetch_new_signals), or None.
     """
     extra = extra or {}
+    settings = load_settings(require_keys=False)
+    db_path = str(settings.signals_db)
+    if idempotent is None:
+        idempotent = settings.signals_idempotent
+
+    dedup_key = build_signal_dedup_key(symbol, timeframe, date, signal_type) if idempotent else None
+    if dedup_key is not None and dedup_key in _recent_keys.get(db_path, ()):
+        return None
 
-    sql = """
-    INSERT INTO signals(
-        symbol, timeframe, date,
-        signal_type, side,
-        entry, stop, tp,
-        rvol, atr14, atr_pct, hh20, ll20, volume, close,
-        created_at
+    params = (
+        symbol,
+        timeframe,
+        int(date),
+        signal_type,
+        side,
+        float(entry),
+        float(stop),
+        float(tp),
+        float(extra.get("rvol", 0.0)),
+        float(extra.get("atr14", 0.0)),
+        float(extra.get("atr_pct", 0.0)),
+        float(extra.get("hh20", 0.0)),
+        float(extra.get("ll20", 0.0)),
+        float(extra.get("volume", 0.0)),
+        float(extra.get("close", 0.0)),
+        now_utc_s(),
+        dedup_key,
     )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
 
-    conn = await _connect()
-    try:
-        cur = await conn.execute(
-            sql,
-            (
-                symbol,
-                timeframe,
-                int(date),
-                signal_type,
-                side,
-                float(entry),
-                float(stop),
-                float(tp),
-                float(extra.get("rvol", 0.0)),
-                float(extra.get("atr14", 0.0)),
-                float(extra.get("atr_pct", 0.0)),
-                float(extra.get("hh20", 0.0)),
-                float(extra.get("ll20", 0.0)),
-                float(extra.get("volume", 0.0)),
-                float(extra.get("close", 0.0)),
-                now_utc_s(),
-            ),
+    if dedup_key is None:
+        sql = """
+        INSERT INTO signals(
+            symbol, timeframe, date,
+            signal_type, side,
+            entry, stop, tp,
+            rvol, atr14, atr_pct, hh20, ll20, volume, close,
+            created_at, dedup_key
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+    else:
+        # NOT EXISTS also covers raw rows written before idempotent mode was on;
+        # the unique index guards against concurrent writers.
+        sql = """
+        INSERT OR IGNORE INTO signals(
+            symbol, timeframe, date,
+            signal_type, side,
+            entry, stop, tp,
+            rvol, atr14, atr_pct, hh20, ll20, volume, close,
+            created_at, dedup_key
         )
+        SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM signals
+            WHERE symbol=? AND timeframe=? AND date=? AND signal_type=?
+        )
+        """
+        params = params + (symbol, timeframe, int(date), signal_type)
+
+    conn = await _connect(db_path)
+    try:
+        cur = await conn.execute(sql, params)
         await conn.commit()
-        return cur.rowcount == 1
+        signal_id = cur.lastrowid if cur.rowcount == 1 else None
     finally:
         await conn.close()
 
+    if dedup_key is not None:
+        _remember_key(db_path, dedup_key)
+    if signal_id is None:
+        return None
+    notify_new_signal(settings.signals_notify_sock)
+    return {
+        "id": int(signal_id),
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "date": int(date),
+        "signal_type": signal_type,
+        "side": side,
+        "entry": float(entry),
+        "stop": float(stop),
+        "tp": float(tp),
+        "created_at": params[15],
+    }
+
 
 async def insert_signal_if_new(
     symbol: str,
@@ -186,7 +311,7 @@ async def insert_signal_if_new(
     tp: float,
     extra: Optional[Dict[str, float]] = None,
 ) -> bool:
-    """Backward-compatible alias; duplicates are still allowed."""
+    """Backward-compatible alias of insert_signal (follows SIGNALS_IDEMPOTENT, raw by default)."""
     return await insert_signal(
         symbol=symbol,
         timeframe=timeframe,
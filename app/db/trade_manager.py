@@ -2,7 +2,8 @@ from __future__ import annotations
 
 import json
 from dataclasses import dataclass
-from typing import Any
+from pathlib import Path
+from typing import Any, Iterable
 
 import aiosqlite
 
@@ -10,8 +11,10 @@ from app.config import load_settings
 from app.timeutil import now_utc_s
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Position:
+    # Slotted: thousands stay resident in ManagerState. Fields follow
+    # _POSITION_COLUMNS so rows are built positionally.
     id: int
     signal_key: str
     symbol: str
@@ -30,9 +33,17 @@ class Position:
     close_price: float | None
 
 
-async def connect() -> aiosqlite.Connection:
-    settings = load_settings(require_keys=False)
-    conn = await aiosqlite.connect(settings.trade_manager_db)
+_POSITION_COLUMNS = """
+          id, signal_key, symbol, timeframe, signal_date, signal_created_at,
+          signal_type, side, entry, sl, tp, opened_at,
+          status, closed_at, close_reason, close_price
+"""
+
+
+async def connect(db_path: Path | None = None) -> aiosqlite.Connection:
+    if db_path is None:
+        db_path = load_settings(require_keys=False).trade_manager_db
+    conn = await aiosqlite.connect(db_path)
     conn.row_factory = aiosqlite.Row
     await conn.execute("PRAGMA journal_mode=WAL;")
     await conn.execute("PRAGMA synchronous=NORMAL;")
@@ -40,6 +51,20 @@ async def connect() -> aiosqlite.Connection:
     return conn
 
 
+async def connect_signals() -> aiosqlite.Connection:
+    """Reader connection to signals.db for the ingest side."""
+    settings = load_settings(require_keys=False)
+    conn = await aiosqlite.connect(settings.signals_db)
+    conn.row_factory = aiosqlite.Row
+    return conn
+
+
+async def get_data_version(conn: aiosqlite.Connection) -> int:
+    """Changes whenever another connection commits to the same DB file."""
+    row = await (await conn.execute("PRAGMA data_version")).fetchone()
+    return int(row[0])
+
+
 async def ensure_schema(conn: aiosqlite.Connection) -> None:
     await conn.executescript(
         """
@@ -63,6 +88,9 @@ async def ensure_schema(conn: aiosqlite.Connection) -> None:
           hit_source TEXT,
           last_tick_ts INTEGER,
           last_tick_price REAL,
+          mae_pct REAL,
+          mfe_pct REAL,
+          upnl_pct REAL,
           meta_json TEXT,
           created_at INTEGER NOT NULL,
           updated_at INTEGER NOT NULL
@@ -81,6 +109,20 @@ async def ensure_schema(conn: aiosqlite.Connection) -> None:
           FOREIGN KEY (pos_id) REFERENCES virtual_positions(id)
         );
 
+        CREATE TABLE IF NOT EXISTS trade_stats (
+          day TEXT NOT NULL,
+          symbol TEXT NOT NULL,
+          signal_type TEXT NOT NULL,
+          side TEXT NOT NULL,
+          trades INTEGER NOT NULL,
+          wins INTEGER NOT NULL,
+          losses INTEGER NOT NULL,
+          r_sum REAL NOT NULL,
+          pnl_pct_sum REAL NOT NULL,
+          updated_at INTEGER NOT NULL,
+          PRIMARY KEY(day, symbol, signal_type, side)
+        );
+
         CREATE TABLE IF NOT EXISTS manager_state (
           k TEXT PRIMARY KEY,
           v TEXT NOT NULL,
@@ -95,11 +137,33 @@ async def ensure_schema(conn: aiosqlite.Connection) -> None:
           ON virtual_positions(opened_at);
         CREATE INDEX IF NOT EXISTS idx_events_ts
           ON position_events(ts);
+        CREATE INDEX IF NOT EXISTS idx_events_pos_ts
+          ON position_events(pos_id, ts);
+        CREATE INDEX IF NOT EXISTS idx_events_type_ts
+          ON position_events(event_type, ts);
         """
     )
+    await _add_missing_columns(conn, "virtual_positions", _ADDED_POSITION_COLUMNS)
     await conn.commit()
 
 
+# Columns added after the first release; CREATE TABLE IF NOT EXISTS does not
+# touch existing databases, so they are added with ALTER TABLE.
+_ADDED_POSITION_COLUMNS = (
+    ("mae_pct", "REAL"),
+    ("mfe_pct", "REAL"),
+    ("upnl_pct", "REAL"),
+)
+
+
+async def _add_missing_columns(conn: aiosqlite.Connection, table: str, columns: tuple[tuple[str, str], ...]) -> None:
+    cur = await conn.execute(f"PRAGMA table_info({table})")
+    existing = {r[1] for r in await cur.fetchall()}
+    for name, decl in columns:
+        if name not in existing:
+            await conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
 async def init_db() -> None:
     conn = await connect()
     try:
@@ -157,6 +221,11 @@ async def fetch_new_signals(
     return await cur.fetchall()
 
 
+async def max_signal_id(conn_signals: aiosqlite.Connection) -> int:
+    row = await (await conn_signals.execute("SELECT COALESCE(MAX(id), 0) FROM signals")).fetchone()
+    return int(row[0])
+
+
 async def has_open_position_for_symbol(conn: aiosqlite.Connection, symbol: str) -> bool:
     row = await (
         await conn.execute(
@@ -167,59 +236,162 @@ async def has_open_position_for_symbol(conn: aiosqlite.Connection, symbol: str)
     return row is not None
 
 
-async def insert_virtual_position_from_signal(
-    conn: aiosqlite.Connection,
-    signal: aiosqlite.Row,
-    meta: dict[str, Any] | None = None,
-) -> bool:
-    now = now_utc_s()
+_INSERT_POSITION_SQL = """
+INSERT OR IGNORE INTO virtual_positions(
+  signal_key, symbol, timeframe, signal_date, signal_created_at,
+  signal_type, side, entry, sl, tp,
+  opened_at, status,
+  created_at, updated_at, meta_json
+)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'OPEN', ?, ?, ?)
+"""
+
+
+def _signal_side(signal: aiosqlite.Row) -> str:
     raw_side = str(signal["side"]).upper()
-    side = "LONG" if raw_side in {"LONG", "BUY"} else "SHORT" if raw_side in {"SHORT", "SELL"} else raw_side
-    signal_key = build_signal_key(
+    return "LONG" if raw_side in {"LONG", "BUY"} else "SHORT" if raw_side in {"SHORT", "SELL"} else raw_side
+
+
+def signal_key_for(signal: aiosqlite.Row) -> str:
+    return build_signal_key(
         signal["symbol"],
         signal["timeframe"],
         signal["date"],
         signal["signal_type"],
+        _signal_side(signal),
+    )
+
+
+def _position_params(signal: aiosqlite.Row, now: int, meta: dict[str, Any] | None) -> tuple:
+    side = _signal_side(signal)
+    return (
+        signal_key_for(signal),
+        signal["symbol"],
+        signal["timeframe"],
+        int(signal["date"]),
+        int(signal["created_at"]),
+        signal["signal_type"],
         side,
+        float(signal["entry"]),
+        float(signal["stop"]),
+        float(signal["tp"]),
+        now,
+        now,
+        now,
+        json.dumps(meta or {}),
     )
 
+
+async def existing_signal_keys(conn: aiosqlite.Connection, keys: Iterable[str]) -> set[str]:
+    """Subset of `keys` that already have a virtual position (any status)."""
+    ordered = sorted(set(keys))
+    if not ordered:
+        return set()
+    placeholders = ",".join("?" * len(ordered))
     cur = await conn.execute(
-        """
-        INSERT OR IGNORE INTO virtual_positions(
-          signal_key, symbol, timeframe, signal_date, signal_created_at,
-          signal_type, side, entry, sl, tp,
-          opened_at, status,
-          created_at, updated_at, meta_json
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'OPEN', ?, ?, ?)
-        """,
-        (
-            signal_key,
-            signal["symbol"],
-            signal["timeframe"],
-            int(signal["date"]),
-            int(signal["created_at"]),
-            signal["signal_type"],
-            side,
-            float(signal["entry"]),
-            float(signal["stop"]),
-            float(signal["tp"]),
-            now,
-            now,
-            now,
-            json.dumps(meta or {}),
-        ),
+        f"SELECT signal_key FROM virtual_positions WHERE signal_key IN ({placeholders})",
+        ordered,
     )
+    return {r[0] for r in await cur.fetchall()}
+
+
+async def insert_virtual_position_from_signal(
+    conn: aiosqlite.Connection,
+    signal: aiosqlite.Row,
+    meta: dict[str, Any] | None = None,
+) -> int | None:
+    """Return new position id, or None if the signal_key already exists."""
+    params = _position_params(signal, now_utc_s(), meta)
+    cur = await conn.execute(_INSERT_POSITION_SQL, params)
     if cur.rowcount == 1:
         pos_id = cur.lastrowid
         await log_position_event(
             conn,
             pos_id=pos_id,
             event_type="OPENED",
-            payload={"signal_id": int(signal["id"]), "signal_key": signal_key},
+            payload={"signal_id": int(signal["id"])},
         )
-        return True
-    return False
+        return int(pos_id)
+    return None
+
+
+async def insert_virtual_positions_from_signals(
+    conn: aiosqlite.Connection,
+    signals: list[aiosqlite.Row],
+) -> list[Position]:
+    """
+    Bulk variant: one executemany for positions, one for OPENED events.
+    Return the positions actually inserted (existing signal_keys are ignored).
+    Caller commits.
+    """
+    if not signals:
+        return []
+
+    now = now_utc_s()
+    row = await (await conn.execute("SELECT COALESCE(MAX(id), 0) FROM virtual_positions")).fetchone()
+    max_id_before = int(row[0])
+
+    signal_id_by_key: dict[str, int] = {}
+    params = []
+    for signal in signals:
+        p = _position_params(signal, now, None)
+        signal_id_by_key.setdefault(p[0], int(signal["id"]))
+        params.append(p)
+    await conn.executemany(_INSERT_POSITION_SQL, params)
+
+    # AUTOINCREMENT ids are monotonic: anything above the old max is ours.
+    cur = await conn.execute(
+        f"""
+        SELECT {_POSITION_COLUMNS}
+        FROM virtual_positions
+        WHERE id > ?
+        ORDER BY id ASC
+        """,
+        (max_id_before,),
+    )
+    opened = [Position(*r) for r in await cur.fetchall()]
+    if not opened:
+        return []
+
+    await log_position_events(
+        conn,
+        [
+            event_row(p.id, "OPENED", ts=now, payload={"signal_id": signal_id_by_key.get(p.signal_key)})
+            for p in opened
+        ],
+    )
+    return opened
+
+
+_INSERT_EVENT_SQL = """
+INSERT INTO position_events(pos_id, ts, event_type, price, bid, ask, payload_json, error)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _payload_json(payload: dict[str, Any] | None) -> str | None:
+    # NULL rather than '{}' for the common no-payload case, no whitespace otherwise
+    return json.dumps(payload, separators=(",", ":")) if payload else None
+
+
+def event_row(
+    pos_id: int,
+    event_type: str,
+    ts: int | None = None,
+    price: float | None = None,
+    bid: float | None = None,
+    ask: float | None = None,
+    payload: dict[str, Any] | None = None,
+    error: str | None = None,
+) -> tuple:
+    """One position_events row for log_position_events()."""
+    return (int(pos_id), int(ts or now_utc_s()), event_type, price, bid, ask, _payload_json(payload), error)
+
+
+async def log_position_events(conn: aiosqlite.Connection, rows: list[tuple]) -> None:
+    """Append event_row() tuples with one executemany. Caller commits."""
+    if rows:
+        await conn.executemany(_INSERT_EVENT_SQL, rows)
 
 
 async def log_position_event(
@@ -233,38 +405,117 @@ async def log_position_event(
     payload: dict[str, Any] | None = None,
     error: str | None = None,
 ) -> None:
-    await conn.execute(
+    await conn.execute(_INSERT_EVENT_SQL, event_row(pos_id, event_type, ts, price, bid, ask, payload, error))
+
+
+async def compact_position_events(
+    conn: aiosqlite.Connection,
+    closed_before: int,
+    max_positions: int = 500,
+) -> tuple[int, int]:
+    """
+    Roll the events of positions closed before `closed_before` into one
+    SUMMARY row each: ts/price/bid/ask/error of the last event, payload
+    with per-type counts and the first ts. Handles at most `max_positions`
+    per call; returns (positions, events removed). Caller commits.
+    """
+    cur = await conn.execute(
         """
-        INSERT INTO position_events(pos_id, ts, event_type, price, bid, ask, payload_json, error)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        SELECT e.pos_id
+        FROM position_events e
+        JOIN virtual_positions p ON p.id = e.pos_id
+        WHERE p.status='CLOSED' AND p.closed_at < ? AND e.event_type != 'SUMMARY'
+        GROUP BY e.pos_id
+        LIMIT ?
         """,
-        (
-            int(pos_id),
-            int(ts or now_utc_s()),
-            event_type,
-            price,
-            bid,
-            ask,
-            json.dumps(payload or {}),
-            error,
-        ),
+        (int(closed_before), int(max_positions)),
     )
+    pos_ids = [int(r[0]) for r in await cur.fetchall()]
+    if not pos_ids:
+        return 0, 0
+
+    placeholders = ",".join("?" * len(pos_ids))
+    cur = await conn.execute(
+        f"""
+        SELECT pos_id, ts, event_type, price, bid, ask, payload_json, error
+        FROM position_events
+        WHERE pos_id IN ({placeholders})
+        ORDER BY pos_id, ts, id
+        """,
+        pos_ids,
+    )
+    summaries: dict[int, dict[str, Any]] = {}
+    removed = 0
+    for pos_id, ts, event_type, price, bid, ask, payload_json, error in await cur.fetchall():
+        s = summaries.get(pos_id)
+        if s is None:
+            s = summaries[pos_id] = {"types": {}, "first_ts": ts, "errors": 0}
+        if event_type == "SUMMARY":
+            # compacted before and got more events since: merge
+            prev = json.loads(payload_json or "{}")
+            for t, n in prev.get("types", {}).items():
+                s["types"][t] = s["types"].get(t, 0) + n
+            s["first_ts"] = min(s["first_ts"], prev.get("first_ts", ts))
+            s["errors"] += prev.get("errors", 0)
+        else:
+            s["types"][event_type] = s["types"].get(event_type, 0) + 1
+            s["errors"] += 1 if error else 0
+        removed += 1
+        s["last"] = (ts, price, bid, ask, error)
+
+    await conn.execute(f"DELETE FROM position_events WHERE pos_id IN ({placeholders})", pos_ids)
+    await log_position_events(
+        conn,
+        [
+            event_row(
+                pos_id,
+                "SUMMARY",
+                ts=s["last"][0],
+                price=s["last"][1],
+                bid=s["last"][2],
+                ask=s["last"][3],
+                payload={"types": s["types"], "first_ts": s["first_ts"], "errors": s["errors"]},
+                error=s["last"][4],
+            )
+            for pos_id, s in summaries.items()
+        ],
+    )
+    return len(pos_ids), removed - len(pos_ids)
 
 
 async def load_open_positions(conn: aiosqlite.Connection) -> list[Position]:
     cur = await conn.execute(
-        """
-        SELECT
-          id, signal_key, symbol, timeframe, signal_date, signal_created_at,
-          signal_type, side, entry, sl, tp, opened_at,
-          status, closed_at, close_reason, close_price
+        f"""
+        SELECT {_POSITION_COLUMNS}
         FROM virtual_positions
         WHERE status='OPEN'
         ORDER BY opened_at ASC
         """
     )
     rows = await cur.fetchall()
-    return [Position(**dict(r)) for r in rows]
+    return [Position(*r) for r in rows]
+
+
+async def load_open_position_ids(conn: aiosqlite.Connection) -> set[int]:
+    cur = await conn.execute("SELECT id FROM virtual_positions WHERE status='OPEN'")
+    return {int(r[0]) for r in await cur.fetchall()}
+
+
+async def load_positions_by_ids(conn: aiosqlite.Connection, ids: set[int]) -> list[Position]:
+    if not ids:
+        return []
+    ordered = sorted(ids)
+    placeholders = ",".join("?" * len(ordered))
+    cur = await conn.execute(
+        f"""
+        SELECT {_POSITION_COLUMNS}
+        FROM virtual_positions
+        WHERE id IN ({placeholders})
+        ORDER BY opened_at ASC
+        """,
+        ordered,
+    )
+    return [Position(*r) for r in await cur.fetchall()]
 
 
 async def close_position_atomic(
@@ -274,7 +525,14 @@ async def close_position_atomic(
     close_price: float,
     hit_source: str,
     tick_ts: int,
+    mae_pct: float | None = None,
+    mfe_pct: float | None = None,
+    pnl_pct: float | None = None,
 ) -> bool:
+    """
+    upnl_pct keeps the PnL at the close price once the position is CLOSED.
+    trade_stats is updated in the same transaction.
+    """
     now = now_utc_s()
     cur = await conn.execute(
         """
@@ -286,9 +544,116 @@ async def close_position_atomic(
             hit_source=?,
             last_tick_ts=?,
             last_tick_price=?,
+            mae_pct=COALESCE(?, mae_pct),
+            mfe_pct=COALESCE(?, mfe_pct),
+            upnl_pct=COALESCE(?, upnl_pct),
             updated_at=?
         WHERE id=? AND status='OPEN'
         """,
-        (now, close_reason, close_price, hit_source, int(tick_ts), close_price, now, int(pos_id)),
+        (
+            now,
+            close_reason,
+            close_price,
+            hit_source,
+            int(tick_ts),
+            close_price,
+            mae_pct,
+            mfe_pct,
+            pnl_pct,
+            now,
+            int(pos_id),
+        ),
+    )
+    if cur.rowcount != 1:
+        return False
+    await conn.execute(_UPSERT_TRADE_STATS_SQL.format(where="id=?"), (now, int(pos_id)))
+    return True
+
+
+# One closed position's contribution to trade_stats. R is PnL over the
+# entry->SL risk; a trade with zero PnL counts as neither win nor loss.
+_TRADE_PNL_PCT = "(CASE side WHEN 'LONG' THEN close_price - entry ELSE entry - close_price END) / entry * 100.0"
+_TRADE_R = "(CASE side WHEN 'LONG' THEN close_price - entry ELSE entry - close_price END) / NULLIF(ABS(entry - sl), 0)"
+
+_UPSERT_TRADE_STATS_SQL = f"""
+INSERT INTO trade_stats(day, symbol, signal_type, side, trades, wins, losses, r_sum, pnl_pct_sum, updated_at)
+SELECT date(closed_at, 'unixepoch'), symbol, signal_type, side,
+       COUNT(*),
+       SUM({_TRADE_PNL_PCT} > 0),
+       SUM({_TRADE_PNL_PCT} < 0),
+       TOTAL({_TRADE_R}),
+       TOTAL({_TRADE_PNL_PCT}),
+       ?
+FROM virtual_positions
+WHERE status='CLOSED' AND close_price IS NOT NULL AND {{where}}
+GROUP BY 1, 2, 3, 4
+ON CONFLICT(day, symbol, signal_type, side) DO UPDATE SET
+  trades = trades + excluded.trades,
+  wins = wins + excluded.wins,
+  losses = losses + excluded.losses,
+  r_sum = r_sum + excluded.r_sum,
+  pnl_pct_sum = pnl_pct_sum + excluded.pnl_pct_sum,
+  updated_at = excluded.updated_at
+"""
+
+
+async def rebuild_trade_stats(conn: aiosqlite.Connection) -> int:
+    """Recompute trade_stats from every CLOSED position. Return rows written. Caller commits."""
+    await conn.execute("DELETE FROM trade_stats")
+    await conn.execute(_UPSERT_TRADE_STATS_SQL.format(where="1"), (now_utc_s(),))
+    row = await (await conn.execute("SELECT COUNT(*) FROM trade_stats")).fetchone()
+    return int(row[0])
+
+
+async def load_trade_stats(
+    conn: aiosqlite.Connection,
+    since_day: str,
+    symbol: str | None = None,
+) -> list[aiosqlite.Row]:
+    """trade_stats rows from `since_day` (YYYY-MM-DD, UTC) on, optionally for one symbol."""
+    sql = "SELECT * FROM trade_stats WHERE day >= ?"
+    params: list[Any] = [since_day]
+    if symbol is not None:
+        sql += " AND symbol = ?"
+        params.append(symbol)
+    cur = await conn.execute(sql + " ORDER BY day, symbol, signal_type, side", params)
+    return list(await cur.fetchall())
+
+
+async def update_excursions(
+    conn: aiosqlite.Connection,
+    rows: list[tuple[int, float, float, float, float, int]],
+) -> None:
+    """Batched MAE/MFE/unrealized PnL flush; rows are (pos_id, mae, mfe, upnl, price, ts)."""
+    now = now_utc_s()
+    await conn.executemany(
+        """
+        UPDATE virtual_positions
+        SET mae_pct=?, mfe_pct=?, upnl_pct=?, last_tick_price=?, last_tick_ts=?, updated_at=?
+        WHERE id=? AND status='OPEN'
+        """,
+        [(mae, mfe, upnl, price, int(ts), now, int(pos_id)) for pos_id, mae, mfe, upnl, price, ts in rows],
+    )
+
+
+async def load_open_excursions(conn: aiosqlite.Connection, ids: set[int] | None = None) -> dict[int, list]:
+    """
+    pos_id -> [mae, mfe, upnl, price, ts] for OPEN positions flushed at
+    least once; only for `ids` when given.
+    """
+    if ids is not None and not ids:
+        return {}
+    where = ""
+    params: list[int] = []
+    if ids is not None:
+        params = sorted(ids)
+        where = f" AND id IN ({','.join('?' * len(params))})"
+    cur = await conn.execute(
+        f"""
+        SELECT id, mae_pct, mfe_pct, upnl_pct, last_tick_price, last_tick_ts
+        FROM virtual_positions
+        WHERE status='OPEN' AND mae_pct IS NOT NULL{where}
+        """,
+        params,
     )
-    return cur.rowcount == 1
+    return {int(r[0]): [r[1], r[2], r[3], r[4] or 0.0, r[5] or 0] for r in await cur.fetchall()}
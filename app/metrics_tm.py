@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Gauge, start_http_server
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 
 tm_ws_connected = Gauge("tm_ws_connected", "WS connected (1/0)")
 tm_open_positions = Gauge("tm_open_positions", "Open virtual positions count")
@@ -6,16 +6,73 @@ tm_subscribed_symbols = Gauge("tm_subscribed_symbols", "Subscribed symbols count
 tm_last_tick_age_seconds = Gauge("tm_last_tick_age_seconds", "Seconds since last tick")
 tm_last_heartbeat_age_seconds = Gauge("tm_last_heartbeat_age_seconds", "Seconds since last heartbeat")
 
-tm_dropped_ticks_total = Counter("tm_dropped_ticks_total", "Dropped ticks total")
+tm_ws_connections = Gauge("tm_ws_connections", "WS connections in the pool")
+tm_ws_conn_connected = Gauge("tm_ws_conn_connected", "WS connection connected (1/0)", ["conn"])
+tm_ws_conn_symbols = Gauge("tm_ws_conn_symbols", "Symbols assigned to a WS connection", ["conn"])
+tm_ws_conn_last_msg_age_seconds = Gauge(
+    "tm_ws_conn_last_msg_age_seconds", "Seconds since last frame on a WS connection", ["conn"]
+)
+tm_ws_conn_lag_seconds = Gauge(
+    "tm_ws_conn_lag_seconds", "Receive time minus exchange ts of the last frame on a WS connection", ["conn"]
+)
+tm_ws_conn_messages_total = Counter("tm_ws_conn_messages_total", "Frames received per WS connection", ["conn"])
+tm_ws_conn_reconnect_total = Counter("tm_ws_conn_reconnect_total", "Reconnects per WS connection", ["conn"])
+
+# Ticks are conflated, so nothing overflows any more: this counts WS frames
+# that were not valid JSON and quotes whose evaluation raised
+# (ManagerState.note_drop; also dropped_ticks_5m in /internal/state).
+tm_dropped_ticks_total = Counter("tm_dropped_ticks_total", "Frames/quotes lost: invalid JSON or failed evaluation")
+tm_conflated_ticks_total = Counter("tm_conflated_ticks_total", "Ticks merged into a pending quote for the same symbol")
+tm_quiet_ticks_total = Counter("tm_quiet_ticks_total", "Quotes not queued for evaluation (far from every SL/TP)")
+tm_kline_catchup_closes_total = Counter(
+    "tm_kline_catchup_closes_total", "Positions closed from 1m klines after a WS outage"
+)
+tm_rest_fallback_active = Gauge("tm_rest_fallback_active", "REST ticker polling active while WS is stale (1/0)")
+tm_rest_fallback_polls_total = Counter("tm_rest_fallback_polls_total", "REST ticker polls made in degraded mode")
+tm_events_compacted_total = Counter(
+    "tm_events_compacted_total", "position_events rows folded into SUMMARY rows by compaction"
+)
 tm_reconnect_total = Counter("tm_reconnect_total", "WS reconnect total")
 tm_exceptions_total = Counter("tm_exceptions_total", "Exceptions total")
 
-_started = False
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+tm_exchange_to_recv_seconds = Histogram(
+    "tm_exchange_to_recv_seconds",
+    "Frame receive time minus exchange ts",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+tm_recv_to_eval_seconds = Histogram(
+    "tm_recv_to_eval_seconds", "Quote receive to tick worker evaluation", buckets=_LATENCY_BUCKETS
+)
+tm_eval_to_commit_seconds = Histogram(
+    "tm_eval_to_commit_seconds", "SL/TP hit to close committed in trade_manager.db", buckets=_LATENCY_BUCKETS
+)
+
+tm_window_events = Gauge(
+    "tm_window_events", "Events over a sliding window (messages, evals, closes, drops)", ["counter", "window"]
+)
+tm_tick_queue_depth = Gauge("tm_tick_queue_depth", "Symbols pending evaluation per tick shard", ["shard"])
+tm_writer_queue_depth = Gauge("tm_writer_queue_depth", "Closes waiting for the position writer")
+tm_tick_worker_utilization = Gauge(
+    "tm_tick_worker_utilization", "Fraction of the last health interval a tick worker spent evaluating", ["shard"]
+)
+tm_symbol_msg_rate = Gauge(
+    "tm_symbol_msg_rate", "Ticker frames/sec per subscribed symbol over the last health interval", ["symbol"]
+)
+tm_open_unrealized_pnl_pct = Gauge(
+    "tm_open_unrealized_pnl_pct", "Sum of unrealized PnL (% of entry) over open positions, as of the last flush"
+)
+tm_open_worst_mae_pct = Gauge("tm_open_worst_mae_pct", "Lowest MAE (% of entry) among open positions")
+tm_open_best_mfe_pct = Gauge("tm_open_best_mfe_pct", "Highest MFE (% of entry) among open positions")
+_EXCURSION_BUCKETS = (-20.0, -10.0, -5.0, -3.0, -2.0, -1.0, -0.5, 0.0, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0)
+tm_closed_mae_pct = Histogram(
+    "tm_closed_mae_pct", "Max adverse excursion (% of entry) of closed positions", buckets=_EXCURSION_BUCKETS
+)
+tm_closed_mfe_pct = Histogram(
+    "tm_closed_mfe_pct", "Max favorable excursion (% of entry) of closed positions", buckets=_EXCURSION_BUCKETS
+)
 
 
-def start_metrics_server(port: int = 9101, addr: str = "127.0.0.1") -> None:
-    global _started
-    if _started:
-        return
-    start_http_server(port, addr=addr)
-    _started = True
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition body and content type; served by the trade manager's state server."""
+    return generate_latest(), CONTENT_TYPE_LATEST
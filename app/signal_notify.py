@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+from pathlib import Path
+
+# Engine -> trade manager wakeup over a Unix datagram socket.
+# Payload is irrelevant: a datagram only means "signals.db has new rows".
+# Best-effort on both ends; the trade manager keeps polling as a fallback.
+
+_PING = b"1"
+
+
+def notify_new_signal(sock_path: Path | str) -> None:
+    """Send a wakeup datagram. Never raises; no listener is a normal case."""
+    if not hasattr(socket, "AF_UNIX"):
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            s.setblocking(False)
+            s.sendto(_PING, os.fspath(sock_path))
+    except OSError:
+        pass
+
+
+class _WakeupProtocol(asyncio.DatagramProtocol):
+    def __init__(self, wakeup: asyncio.Event) -> None:
+        self.wakeup = wakeup
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        self.wakeup.set()
+
+
+async def open_signal_listener(
+    sock_path: Path | str,
+    wakeup: asyncio.Event,
+) -> asyncio.DatagramTransport | None:
+    """
+    Bind the wakeup socket and set `wakeup` on every datagram.
+    Return None when Unix sockets are unavailable (caller falls back to polling).
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    path = os.fspath(sock_path)
+    try:
+        os.unlink(path)  # stale socket from a previous run
+    except FileNotFoundError:
+        pass
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.bind(path)
+        sock.setblocking(False)
+    except OSError:
+        sock.close()
+        return None
+
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: _WakeupProtocol(wakeup), sock=sock)
+    return transport
+
+
+def close_signal_listener(transport: asyncio.DatagramTransport | None, sock_path: Path | str) -> None:
+    if transport is None:
+        return
+    transport.close()
+    try:
+        os.unlink(os.fspath(sock_path))
+    except OSError:
+        pass
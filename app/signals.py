@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 
 from app.config import load_settings
 from app.db.indicators import get_indicator, get_latest_indicator
 from app.db.prices import get_candle, get_latest_candle
-from app.db.signals import insert_signal
+from app.db.signals import insert_signal_row
 from app.logger import setup_logger
 
 
@@ -15,6 +15,22 @@ MIN_RVOL = 2.1
 MIN_ATR_PCT = 0.01
 RR_MULTIPLIER = 2.0
 
+# Combined runner (app/combined.py): new signals are also handed straight to
+# the in-process trade manager. None in the split deployment, where the trade
+# manager picks them up from signals.db.
+SignalSink = Callable[[Dict[str, Any]], None]
+_signal_sink: Optional[SignalSink] = None
+
+
+def set_signal_sink(sink: Optional[SignalSink]) -> None:
+    global _signal_sink
+    _signal_sink = sink
+
+
+def _hand_off(row: Dict[str, Any]) -> None:
+    if _signal_sink is not None:
+        _signal_sink(row)
+
 
 async def generate_for_symbol(symbol: str, timeframe: str, log, date: int | None = None):
     """
@@ -66,7 +82,7 @@ async def generate_for_symbol(symbol: str, timeframe: str, log, date: int | None
             return
         tp = entry + (risk * RR_MULTIPLIER)
 
-        inserted = await insert_signal(
+        row = await insert_signal_row(
             symbol=symbol,
             timeframe=timeframe,
             date=c_date,
@@ -86,7 +102,8 @@ async def generate_for_symbol(symbol: str, timeframe: str, log, date: int | None
             },
         )
 
-        if inserted:
+        if row:
+            _hand_off(row)
             log.info(
                 f"SIGNAL LONG {symbol} @ {c_date} "
                 f"entry={entry:.4f} stop={stop:.4f} tp={tp:.4f}"
@@ -103,7 +120,7 @@ async def generate_for_symbol(symbol: str, timeframe: str, log, date: int | None
             return
         tp = entry - (risk * RR_MULTIPLIER)
 
-        inserted = await insert_signal(
+        row = await insert_signal_row(
             symbol=symbol,
             timeframe=timeframe,
             date=c_date,
@@ -123,7 +140,8 @@ async def generate_for_symbol(symbol: str, timeframe: str, log, date: int | None
             },
         )
 
-        if inserted:
+        if row:
+            _hand_off(row)
             log.info(
                 f"SIGNAL SHORT {symbol} @ {c_date} "
                 f"entry={entry:.4f} stop={stop:.4f} tp={tp:.4f}"
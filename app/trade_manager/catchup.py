@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from app.bybit.rest import BybitREST
+from app.db.trade_manager import Position
+from app.metrics_tm import tm_exceptions_total, tm_kline_catchup_closes_total
+from app.trade_manager.state import ManagerState
+from app.trade_manager.triggers import TriggerIndex
+from app.trade_manager.writer import CloseRequest, PositionWriter
+
+KLINE_INTERVAL = "1"
+MAX_KLINES = 1000  # Bybit per-request cap, ~16h of 1m candles
+
+
+def sweep_klines(
+    index: TriggerIndex,
+    klines: list[dict[str, Any]],
+    not_before_ms: int = 0,
+    spread: float = 0.0,
+) -> list[tuple[Position, str, float, int]]:
+    """
+    Walk 1m klines oldest first through a TriggerIndex and return
+    (position, "SL"|"TP", level_price, kline_start_s) for each first hit.
+
+    Klines are last-price candles. With `spread` > 0 (bidask mode) they
+    are read as bid/ask bounds: bid <= last <= ask, so a low at or under a
+    LONG SL means the bid got there too (and a high at or over a SHORT SL,
+    the ask). TPs must clear the level by the spread (LONG: high - spread,
+    SHORT: low + spread), taken from the last quote before the outage. A kline that started before `not_before_ms` (the outage
+    start) or before a position opened is ignored: its range may include
+    prices the live path already evaluated, or prices from before the
+    open. SL wins when one kline reached both.
+    """
+    closed: set[int] = set()
+    out: list[tuple[Position, str, float, int]] = []
+    for k in klines:
+        low, high, start_ms = k["low"], k["high"], int(k["start"])
+        if start_ms < not_before_ms:
+            continue
+        for pos, reason, _ in index.crossed(low, high - spread, low + spread, high):
+            if pos.id in closed or pos.opened_at * 1000 > start_ms:
+                continue
+            closed.add(pos.id)
+            out.append((pos, reason, float(pos.sl if reason == "SL" else pos.tp), start_ms // 1000))
+    return out
+
+
+def _spread(state: ManagerState, symbol: str, hit_mode: str) -> float:
+    if hit_mode != "bidask":
+        return 0.0
+    quote = state.last_quote_by_symbol.get(symbol)
+    if quote is None or quote.bid is None or quote.ask is None or quote.ask < quote.bid:
+        return float("inf")  # no TP can be proven, SLs still can
+    return quote.ask - quote.bid
+
+
+async def _fetch(client: BybitREST, sem: asyncio.Semaphore, symbol: str, start_ms: int, end_ms: int):
+    async with sem:
+        limit = min(MAX_KLINES, (end_ms - start_ms) // 60_000 + 1)
+        return await client.get_kline(symbol, KLINE_INTERVAL, limit=limit, start=start_ms, end=end_ms)
+
+
+async def kline_catchup(
+    state: ManagerState,
+    symbols: set[str],
+    start_ts: int,
+    end_ts: int,
+    writer: PositionWriter,
+    log,
+    concurrency: int = 8,
+    client: BybitREST | None = None,
+    hit_mode: str = "last_price",
+) -> int:
+    """
+    Close positions whose SL/TP was crossed while the stream was down
+    ([start_ts, end_ts], seconds). Return the number of closes submitted.
+
+    Only klines that start inside the gap are used, so the partial minute
+    before it (already seen live) is not re-evaluated. In bidask mode
+    the spread of the symbol's last quote bounds the TP checks (see
+    sweep_klines); without a known spread only SLs are caught up.
+    """
+    symbols = {s for s in symbols if s in state.triggers_by_symbol}
+    if not symbols or end_ts <= start_ts:
+        return 0
+
+    start_ms = -(-start_ts // 60) * 60_000  # first minute boundary in the gap
+    end_ms = end_ts * 1000
+    if start_ms >= end_ms:
+        return 0
+    if (end_ms - start_ms) // 60_000 >= MAX_KLINES:
+        log.warning("TM catch-up gap of %ss exceeds %s klines, checking the last part only", end_ts - start_ts, MAX_KLINES)
+        start_ms = end_ms - (MAX_KLINES - 1) * 60_000
+
+    owns_client = client is None
+    if client is None:
+        client = BybitREST()
+    sem = asyncio.Semaphore(max(1, concurrency))
+    ordered = sorted(symbols)
+    try:
+        results = await asyncio.gather(
+            *(_fetch(client, sem, s, start_ms, end_ms) for s in ordered),
+            return_exceptions=True,
+        )
+    finally:
+        if owns_client:
+            await client.close()
+
+    hits: list[tuple[Position, str, float, int]] = []
+    for symbol, klines in zip(ordered, results):
+        if isinstance(klines, BaseException):
+            tm_exceptions_total.inc()
+            log.warning("TM catch-up klines failed symbol=%s (%s)", symbol, klines)
+            continue
+        index = state.triggers_by_symbol.get(symbol)
+        if index is not None:
+            hits.extend(sweep_klines(index, klines, not_before_ms=start_ms, spread=_spread(state, symbol, hit_mode)))
+
+    if not hits:
+        return 0
+
+    by_symbol: dict[str, set[int]] = {}
+    for pos, _, _, _ in hits:
+        by_symbol.setdefault(pos.symbol, set()).add(pos.id)
+    async with state.global_lock:
+        for symbol, ids in by_symbol.items():
+            state.remove_positions_unlocked(symbol, ids)
+
+    eval_ts = time.time()
+    for pos, reason, price, kline_ts in hits:
+        log.info("TM CATCHUP %s symbol=%s pos_id=%s price=%s kline_ts=%s", reason, pos.symbol, pos.id, price, kline_ts)
+        writer.submit_close(
+            CloseRequest(
+                position=pos,
+                close_reason=reason,
+                close_price=price,
+                hit_source="kline_catchup",
+                tick_ts=kline_ts,
+                eval_ts=eval_ts,
+                excursion=state.excursions.finish(pos, price, kline_ts),
+            )
+        )
+    tm_kline_catchup_closes_total.inc(len(hits))
+    return len(hits)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+
+import aiosqlite
+
+from app.db.trade_manager import compact_position_events, connect
+from app.metrics_tm import tm_events_compacted_total, tm_exceptions_total
+from app.timeutil import now_utc_s
+
+COMPACT_CHUNK = 500  # positions per transaction, keeps each write lock short
+
+
+async def compact_events_once(
+    retain_days: float,
+    log,
+    conn: aiosqlite.Connection | None = None,
+) -> tuple[int, int]:
+    """Compact events of positions closed more than `retain_days` ago. Return (positions, rows removed)."""
+    owns_conn = conn is None
+    if conn is None:
+        conn = await connect()
+    cutoff = now_utc_s() - int(retain_days * 86400)
+    positions = removed = 0
+    try:
+        while True:
+            n, r = await compact_position_events(conn, cutoff, COMPACT_CHUNK)
+            await conn.commit()
+            if not n:
+                break
+            positions += n
+            removed += r
+            await asyncio.sleep(0)  # let the tick path in between chunks
+    finally:
+        if owns_conn:
+            await conn.close()
+    if positions:
+        tm_events_compacted_total.inc(removed)
+        log.info("TM events compacted positions=%s rows_removed=%s", positions, removed)
+    return positions, removed
+
+
+async def event_compaction_loop(interval_sec: float, retain_days: float, log) -> None:
+    while True:
+        try:
+            await compact_events_once(retain_days, log)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            tm_exceptions_total.inc()
+            log.warning("TM event compaction failed (%s)", exc)
+        await asyncio.sleep(interval_sec)
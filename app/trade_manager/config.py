@@ -8,20 +8,58 @@ from dataclasses import dataclass
 class TradeManagerConfig:
     ingest_batch_size: int = 500
     ingest_poll_sec: float = 1.0
+    ingest_fallback_poll_sec: float = 15.0  # poll interval while the wakeup socket is bound
     health_log_sec: int = 60
     liveness_timeout_sec: int = 45
     trigger_price_mode: str = "bidask"  # bidask | last_price
     max_open_per_symbol: int = 1
+    tick_workers: int = 1  # tick shards; interleaving only, all share one event loop
     ws_url: str = "wss://stream.bybit.com/v5/public/linear"
+    ws_subscribe_batch: int = 10  # max args per subscribe/unsubscribe request
+    ws_max_topics_per_conn: int = 200
+    ws_max_connections: int = 8
+    proximity_pct: float = 0.001  # evaluate every tick within this fraction of a level
+    tape_path: str = ""  # record raw WS frames here (see app/trade_manager/tape.py)
+    kline_catchup: bool = True  # on reconnect, check the outage against 1m klines (bidask: spread-adjusted)
+    kline_catchup_concurrency: int = 8
+    rest_fallback_poll_sec: float = 2.0  # 0 disables the REST ticker fallback
+    rest_fallback_after_sec: float = 10.0  # WS silence before polling starts
+    snapshot_path: str = ""  # default: <db_dir>/trade_manager.snapshot.json
+    snapshot_sec: float = 5.0  # 0 disables the restart snapshot
+    excursion_flush_sec: float = 10.0  # MAE/MFE/unrealized PnL flush to virtual_positions, 0 disables
+    event_compact_sec: float = 3600.0  # position_events compaction interval, 0 disables
+    event_retain_days: float = 7.0  # keep full events for positions closed within this window
+    http_host: str = "127.0.0.1"
+    http_port: int = 9101  # /internal/state + /metrics, 0 disables
+    state_refresh_sec: float = 1.0
 
 
 def load_trade_manager_config() -> TradeManagerConfig:
     return TradeManagerConfig(
         ingest_batch_size=int(os.getenv("TM_INGEST_BATCH_SIZE", "500")),
         ingest_poll_sec=float(os.getenv("TM_INGEST_POLL_SEC", "1.0")),
+        ingest_fallback_poll_sec=float(os.getenv("TM_INGEST_FALLBACK_POLL_SEC", "15.0")),
         health_log_sec=int(os.getenv("TM_HEALTH_LOG_SEC", "60")),
         liveness_timeout_sec=int(os.getenv("TM_LIVENESS_TIMEOUT_SEC", "45")),
         trigger_price_mode=os.getenv("TM_HIT_PRICE_MODE", "bidask"),
         max_open_per_symbol=int(os.getenv("TM_MAX_OPEN_PER_SYMBOL", "1")),
+        tick_workers=int(os.getenv("TM_TICK_WORKERS", "1")),
         ws_url=os.getenv("TM_WS_URL", "wss://stream.bybit.com/v5/public/linear"),
+        ws_subscribe_batch=int(os.getenv("TM_WS_SUBSCRIBE_BATCH", "10")),
+        ws_max_topics_per_conn=int(os.getenv("TM_WS_MAX_TOPICS_PER_CONN", "200")),
+        ws_max_connections=int(os.getenv("TM_WS_MAX_CONNECTIONS", "8")),
+        proximity_pct=float(os.getenv("TM_PROXIMITY_PCT", "0.001")),
+        tape_path=os.getenv("TM_TAPE_PATH", ""),
+        kline_catchup=os.getenv("TM_KLINE_CATCHUP", "1").strip().lower() in {"1", "true", "yes", "on"},
+        kline_catchup_concurrency=int(os.getenv("TM_KLINE_CATCHUP_CONCURRENCY", "8")),
+        rest_fallback_poll_sec=float(os.getenv("TM_REST_FALLBACK_POLL_SEC", "2.0")),
+        rest_fallback_after_sec=float(os.getenv("TM_REST_FALLBACK_AFTER_SEC", "10.0")),
+        snapshot_path=os.getenv("TM_SNAPSHOT_PATH", ""),
+        snapshot_sec=float(os.getenv("TM_SNAPSHOT_SEC", "5.0")),
+        excursion_flush_sec=float(os.getenv("TM_EXCURSION_FLUSH_SEC", "10.0")),
+        event_compact_sec=float(os.getenv("TM_EVENT_COMPACT_SEC", "3600")),
+        event_retain_days=float(os.getenv("TM_EVENT_RETAIN_DAYS", "7")),
+        http_host=os.getenv("TM_HTTP_HOST", "127.0.0.1"),
+        http_port=int(os.getenv("TM_HTTP_PORT", "9101")),
+        state_refresh_sec=float(os.getenv("TM_STATE_REFRESH_SEC", "1.0")),
     )
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+
+from app.trade_manager.quotes import Quote
+
+
+class TickConflator:
+    """
+    FIFO ready-set of symbols whose Quote changed since a worker last took it.
+
+    A symbol is queued once until a worker takes it; later frames update the
+    same Quote in place (latest prices + bid/ask/last lo/hi since the last
+    take). Memory is bounded by the number of symbols, nothing is dropped.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[str, Quote] = {}
+        self._ready: deque[str] = deque()
+        self._wakeup = asyncio.Event()
+        self.conflated = 0
+        self.busy_sec = 0.0  # time its worker spent in on_tick
+
+    def put(self, quote: Quote) -> bool:
+        """Mark a quote dirty. Return True if it was already pending (conflated)."""
+        symbol = quote.symbol
+        if symbol in self._pending:
+            self.conflated += 1
+            return True
+
+        self._pending[symbol] = quote
+        self._ready.append(symbol)
+        self._wakeup.set()
+        return False
+
+    async def get(self) -> Quote:
+        while not self._ready:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        symbol = self._ready.popleft()
+        return self._pending.pop(symbol).take()
+
+    def qsize(self) -> int:
+        return len(self._ready)
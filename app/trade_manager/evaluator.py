@@ -3,6 +3,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 from app.db.trade_manager import Position
+from app.trade_manager.quotes import Quote
+from app.trade_manager.triggers import TriggerIndex
 
 
 @dataclass(frozen=True)
@@ -13,39 +15,77 @@ class EvalResult:
     hit_source: str | None = None
 
 
+def _ranges(quote: Quote, mode: str) -> tuple[float, float, float, float, str] | None:
+    """
+    (long_lo, long_hi, short_lo, short_hi, source), or None if the quote
+    has no price window yet (never priced, or restored from a snapshot and
+    not refreshed by a frame since).
+    """
+    if mode == "bidask":
+        if quote.bid_lo is None or quote.ask_lo is None:
+            return None
+        return quote.bid_lo, quote.bid_hi, quote.ask_lo, quote.ask_hi, "bidask"
+    if quote.last_lo is None:
+        return None
+    return quote.last_lo, quote.last_hi, quote.last_lo, quote.last_hi, "last_price"
+
+
 def evaluate_hit(
     position: Position,
-    quote: dict,
+    quote: Quote,
     mode: str,
 ) -> EvalResult:
+    """
+    LONG closes on the bid (or last), SHORT on the ask (or last).
+    Conflated quotes carry lo/hi extremes; SL is checked first, so a window
+    that touched both levels closes as SL.
+    """
     side = position.side.upper()
-    bid = quote.get("bid")
-    ask = quote.get("ask")
-    last = quote.get("last")
 
-    if mode == "bidask" and (bid is None or ask is None):
+    ranges = _ranges(quote, mode)
+    if ranges is None:
         return EvalResult(should_close=False)
-
-    if mode == "bidask":
-        long_price = float(bid)
-        short_price = float(ask)
-        source = "bidask"
-    else:
-        if last is None:
-            return EvalResult(should_close=False)
-        long_price = float(last)
-        short_price = float(last)
-        source = "last_price"
+    long_lo, long_hi, short_lo, short_hi, source = ranges
 
     if side == "LONG":
-        if long_price <= position.sl:
-            return EvalResult(True, "SL", long_price, source)
-        if long_price >= position.tp:
-            return EvalResult(True, "TP", long_price, source)
+        if long_lo <= position.sl:
+            return EvalResult(True, "SL", float(long_lo), source)
+        if long_hi >= position.tp:
+            return EvalResult(True, "TP", float(long_hi), source)
     elif side == "SHORT":
-        if short_price >= position.sl:
-            return EvalResult(True, "SL", short_price, source)
-        if short_price <= position.tp:
-            return EvalResult(True, "TP", short_price, source)
+        if short_hi >= position.sl:
+            return EvalResult(True, "SL", float(short_hi), source)
+        if short_lo <= position.tp:
+            return EvalResult(True, "TP", float(short_lo), source)
 
     return EvalResult(should_close=False)
+
+
+def evaluate_index(
+    index: TriggerIndex,
+    quote: Quote,
+    mode: str,
+) -> list[tuple[Position, EvalResult]]:
+    """Same rules as evaluate_hit, for all of a symbol's positions at once."""
+    ranges = _ranges(quote, mode)
+    if ranges is None:
+        return []
+    long_lo, long_hi, short_lo, short_hi, source = ranges
+
+    return [
+        (pos, EvalResult(True, reason, float(price), source))
+        for pos, reason, price in index.crossed(long_lo, long_hi, short_lo, short_hi)
+    ]
+
+
+def is_near_trigger(index: TriggerIndex, quote: Quote, mode: str, margin: float) -> bool:
+    """
+    Cheap pre-check for the WS side: False means no level can have been
+    crossed since the quote's lo/hi window was last taken, so the quote
+    need not be queued for evaluation.
+    """
+    ranges = _ranges(quote, mode)
+    if ranges is None:
+        return False
+    long_lo, long_hi, short_lo, short_hi, _ = ranges
+    return index.near(long_lo, long_hi, short_lo, short_hi, margin)
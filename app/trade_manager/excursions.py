@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from typing import Collection, Iterable, Mapping
+
+from app.db.trade_manager import Position
+from app.metrics_tm import tm_open_best_mfe_pct, tm_open_unrealized_pnl_pct, tm_open_worst_mae_pct
+from app.trade_manager.quotes import Quote
+
+
+class Excursion:
+    """Running PnL extremes of one open position, in percent of entry."""
+
+    __slots__ = ("mae_pct", "mfe_pct", "upnl_pct", "price", "ts", "dirty")
+
+    def __init__(self, mae_pct: float, mfe_pct: float, upnl_pct: float, price: float, ts: int) -> None:
+        self.mae_pct = mae_pct  # worst PnL seen (<= 0 once price went against us)
+        self.mfe_pct = mfe_pct  # best PnL seen
+        self.upnl_pct = upnl_pct  # PnL at the last price
+        self.price = price
+        self.ts = ts
+        self.dirty = True  # changed since the last flush
+
+    def as_list(self) -> list[float | int]:
+        return [self.mae_pct, self.mfe_pct, self.upnl_pct, self.price, self.ts]
+
+
+class _Window:
+    """Per-symbol price extremes since the last fold."""
+
+    __slots__ = ("long_lo", "long_hi", "long_px", "short_lo", "short_hi", "short_px", "ts")
+
+    def __init__(self, long_px: float, short_px: float, ts: int) -> None:
+        self.long_lo = self.long_hi = self.long_px = long_px
+        self.short_lo = self.short_hi = self.short_px = short_px
+        self.ts = ts
+
+
+def pnl_pct(position: Position, price: float) -> float:
+    entry = float(position.entry)
+    if not entry:
+        return 0.0
+    move = (price - entry) / entry * 100.0
+    return move if position.side.upper() == "LONG" else -move
+
+
+class ExcursionBook:
+    """
+    MAE/MFE/unrealized PnL for every open position.
+
+    The WS side calls observe() for each changed quote of a symbol with
+    open positions; that only widens a per-symbol window, O(1) per tick
+    whatever the number of positions. fold() applies the window to the
+    symbol's positions: on the flush timer, before positions are added
+    (so a new position never sees prices from before it opened) and
+    before they are removed on close. Prices follow the hit mode: LONG on
+    the bid (or last), SHORT on the ask (or last).
+    """
+
+    def __init__(self, hit_mode: str = "bidask") -> None:
+        self.hit_mode = hit_mode
+        self.by_pos: dict[int, Excursion] = {}
+        self._windows: dict[str, _Window] = {}
+
+    def observe(self, quote: Quote) -> None:
+        if self.hit_mode == "bidask":
+            long_px, short_px = quote.bid, quote.ask
+        else:
+            long_px = short_px = quote.last
+        if long_px is None or short_px is None:
+            return
+        w = self._windows.get(quote.symbol)
+        if w is None:
+            self._windows[quote.symbol] = _Window(long_px, short_px, quote.ts)
+            return
+        if long_px < w.long_lo:
+            w.long_lo = long_px
+        elif long_px > w.long_hi:
+            w.long_hi = long_px
+        if short_px < w.short_lo:
+            w.short_lo = short_px
+        elif short_px > w.short_hi:
+            w.short_hi = short_px
+        w.long_px = long_px
+        w.short_px = short_px
+        w.ts = quote.ts
+
+    def _update(self, position: Position, worst: float, best: float, price: float, ts: int) -> None:
+        upnl = pnl_pct(position, price)
+        exc = self.by_pos.get(position.id)
+        if exc is None:
+            self.by_pos[position.id] = Excursion(
+                min(pnl_pct(position, worst), upnl), max(pnl_pct(position, best), upnl), upnl, price, ts
+            )
+            return
+        mae = pnl_pct(position, worst)
+        mfe = pnl_pct(position, best)
+        if mae < exc.mae_pct:
+            exc.mae_pct = mae
+        if mfe > exc.mfe_pct:
+            exc.mfe_pct = mfe
+        exc.upnl_pct = upnl
+        exc.price = price
+        exc.ts = ts
+        exc.dirty = True
+
+    def fold(self, symbol: str, positions: Iterable[Position]) -> None:
+        w = self._windows.pop(symbol, None)
+        if w is None:
+            return
+        for p in positions:
+            if p.side.upper() == "LONG":
+                self._update(p, w.long_lo, w.long_hi, w.long_px, w.ts)
+            else:
+                self._update(p, w.short_hi, w.short_lo, w.short_px, w.ts)
+
+    def fold_all(self, positions_by_symbol: Mapping[str, Mapping[int, Position]]) -> None:
+        for symbol in list(self._windows):
+            group = positions_by_symbol.get(symbol)
+            if group:
+                self.fold(symbol, group.values())
+            else:
+                del self._windows[symbol]
+
+    def finish(self, position: Position, close_price: float, ts: int) -> Excursion:
+        """Pop the record of a closing position, extended to its close price."""
+        exc = self.by_pos.pop(position.id, None)
+        pnl = pnl_pct(position, close_price)
+        if exc is None:
+            return Excursion(min(pnl, 0.0), max(pnl, 0.0), pnl, close_price, ts)
+        exc.mae_pct = min(exc.mae_pct, pnl)
+        exc.mfe_pct = max(exc.mfe_pct, pnl)
+        exc.upnl_pct = pnl
+        exc.price = close_price
+        exc.ts = ts
+        return exc
+
+    def restore(self, position: Position, exc: Excursion) -> None:
+        """Put back the record finish() popped, for a close that failed to commit."""
+        exc.dirty = True
+        self.by_pos[position.id] = exc
+
+    def mark_dirty(self, pos_ids: Iterable[int]) -> None:
+        """Flush these records again (their last flush failed)."""
+        for pos_id in pos_ids:
+            exc = self.by_pos.get(pos_id)
+            if exc is not None:
+                exc.dirty = True
+
+    def take_dirty(self, open_ids: Collection[int]) -> list[tuple[int, float, float, float, float, int]]:
+        """(pos_id, mae, mfe, upnl, price, ts) for records changed since the last call."""
+        out = []
+        for pos_id in list(self.by_pos):
+            exc = self.by_pos[pos_id]
+            if pos_id not in open_ids:
+                # dropped by a reload without going through finish()
+                del self.by_pos[pos_id]
+                continue
+            if exc.dirty:
+                exc.dirty = False
+                out.append((pos_id, exc.mae_pct, exc.mfe_pct, exc.upnl_pct, exc.price, exc.ts))
+        return out
+
+    def load(self, records: Mapping[int, list]) -> None:
+        for pos_id, (mae, mfe, upnl, price, ts) in records.items():
+            exc = Excursion(float(mae), float(mfe), float(upnl), float(price), int(ts))
+            exc.dirty = False
+            self.by_pos[int(pos_id)] = exc
+
+    def publish(self) -> None:
+        records = self.by_pos.values()
+        tm_open_unrealized_pnl_pct.set(sum(e.upnl_pct for e in records))
+        tm_open_worst_mae_pct.set(min((e.mae_pct for e in records), default=0.0))
+        tm_open_best_mfe_pct.set(max((e.mfe_pct for e in records), default=0.0))
+
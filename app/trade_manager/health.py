@@ -8,29 +8,72 @@ from app.metrics_tm import (
     tm_last_tick_age_seconds,
     tm_open_positions,
     tm_subscribed_symbols,
+    tm_symbol_msg_rate,
+    tm_tick_queue_depth,
+    tm_tick_worker_utilization,
+    tm_writer_queue_depth,
     tm_ws_connected,
 )
 from app.trade_manager.state import ManagerState
+from app.trade_manager.writer import PositionWriter
 
 
-async def health_loop(state: ManagerState, log_interval_sec: int, liveness_timeout_sec: int, log) -> None:
+def _publish_symbol_rates(
+    state: ManagerState,
+    subscribed: set[str],
+    prev_msgs: dict[str, int],
+    elapsed: float,
+) -> list[tuple[str, float]]:
+    """Set tm_symbol_msg_rate for subscribed symbols; return (symbol, rate) busiest first."""
+    rates = []
+    for symbol in subscribed:
+        quote = state.last_quote_by_symbol.get(symbol)
+        msgs = quote.msgs if quote is not None else 0
+        rate = max(0, msgs - prev_msgs.get(symbol, msgs)) / elapsed
+        prev_msgs[symbol] = msgs
+        tm_symbol_msg_rate.labels(symbol=symbol).set(rate)
+        rates.append((symbol, rate))
+
+    for symbol in set(prev_msgs) - subscribed:
+        del prev_msgs[symbol]
+        try:
+            tm_symbol_msg_rate.remove(symbol)
+        except KeyError:
+            pass
+
+    rates.sort(key=lambda x: x[1], reverse=True)
+    return rates
+
+
+async def health_loop(
+    state: ManagerState,
+    log_interval_sec: int,
+    liveness_timeout_sec: int,
+    log,
+    writer: PositionWriter | None = None,
+) -> None:
+    prev_busy = [0.0] * len(state.tick_shards)
+    prev_msgs: dict[str, int] = {}
+    prev_at = time.perf_counter()
     while True:
         now = int(time.time())
-        async with state.global_lock:
-            open_count = sum(len(v) for v in state.open_positions_by_symbol.values())
-            subscribed_count = len(state.subscribed_symbols)
-            ws_state = state.ws_state
-            last_heartbeat_ts = state.last_heartbeat_ts
-            last_tick_ts = state.last_tick_ts
-            dropped_ticks = state.dropped_ticks
-
-            is_stale = (
-                ws_state == "CONNECTED"
-                and bool(last_heartbeat_ts)
-                and (now - last_heartbeat_ts) > liveness_timeout_sec
-            )
-            if is_stale:
-                state.force_reconnect = True
+        # Plain reads: no await between them, and every field has one writer.
+        open_count = state.open_count()
+        subscribed_count = len(state.subscribed_symbols)
+        ws_state = state.ws_state
+        last_heartbeat_ts = state.last_heartbeat_ts
+        last_tick_ts = state.last_tick_ts
+        dropped_ticks = state.dropped_ticks
+        conflated_ticks = sum(c.conflated for c in state.tick_shards)
+        pending_symbols = sum(c.qsize() for c in state.tick_shards)
+
+        is_stale = (
+            ws_state == "CONNECTED"
+            and bool(last_heartbeat_ts)
+            and (now - last_heartbeat_ts) > liveness_timeout_sec
+        )
+        if is_stale:
+            state.force_reconnect = True
 
         tm_ws_connected.set(1 if ws_state == "CONNECTED" else 0)
         tm_open_positions.set(open_count)
@@ -38,12 +81,27 @@ async def health_loop(state: ManagerState, log_interval_sec: int, liveness_timeo
         tm_last_heartbeat_age_seconds.set(max(0, now - last_heartbeat_ts) if last_heartbeat_ts else 0)
         tm_last_tick_age_seconds.set(max(0, now - last_tick_ts) if last_tick_ts else 0)
 
+        at = time.perf_counter()
+        elapsed = max(at - prev_at, 1e-9)
+        prev_at = at
+        for i, shard in enumerate(state.tick_shards):
+            tm_tick_queue_depth.labels(shard=str(i)).set(shard.qsize())
+            tm_tick_worker_utilization.labels(shard=str(i)).set(min(1.0, (shard.busy_sec - prev_busy[i]) / elapsed))
+            prev_busy[i] = shard.busy_sec
+        if writer is not None:
+            tm_writer_queue_depth.set(writer.queue.qsize())
+        rates = _publish_symbol_rates(state, set(state.subscribed_symbols), prev_msgs, elapsed)
+        busiest = " ".join(f"{sym}={rate:.1f}/s" for sym, rate in rates[:3])
+
         log.info(
-            "TM HEARTBEAT ws=%s open=%s subscribed=%s dropped_ticks=%s",
+            "TM HEARTBEAT ws=%s open=%s subscribed=%s dropped_ticks=%s conflated_ticks=%s pending=%s busiest=[%s]",
             ws_state,
             open_count,
             subscribed_count,
             dropped_ticks,
+            conflated_ticks,
+            pending_symbols,
+            busiest,
         )
 
         if is_stale:
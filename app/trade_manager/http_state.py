@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any
+
+from aiohttp import web
+
+from app.metrics_tm import render_metrics, tm_exceptions_total, tm_window_events
+from app.trade_manager.state import ManagerState
+
+
+def engine_status(state: ManagerState, now: int, liveness_timeout_sec: int) -> str:
+    if not state.last_heartbeat_ts:
+        return "STARTING"
+    if state.ws_state != "CONNECTED" or (now - state.last_heartbeat_ts) > liveness_timeout_sec:
+        return "DEGRADED"
+    return "RUNNING"
+
+
+class StateCache:
+    """
+    Pre-rendered /internal/state body. refresh() runs on a timer and only
+    does plain reads of single-writer fields (like health_loop), so a
+    request costs nothing on the tick path: no global_lock, no state walk.
+    The shape is what telegram_sidecar.api.services expects. refresh()
+    also publishes the rolling window counters as tm_window_events.
+    """
+
+    def __init__(self, state: ManagerState, liveness_timeout_sec: int = 45) -> None:
+        self.state = state
+        self.liveness_timeout_sec = liveness_timeout_sec
+        self.started_at = int(time.time())
+        self.body = b'{"ok":false}'
+
+    def build(self, now_f: float) -> dict[str, Any]:
+        state = self.state
+        now = int(now_f)
+        last_msg_ts = state.last_heartbeat_ts
+        last_recv = state.last_msg_recv_ts
+        windows = state.rolling.totals(now)
+        for counter, totals in windows.items():
+            for window, value in totals.items():
+                tm_window_events.labels(counter=counter, window=window).set(value)
+        return {
+            "ok": True,
+            "data": {
+                "generated_at": now,
+                "engine": {
+                    "status": engine_status(state, now, self.liveness_timeout_sec),
+                    "uptime_sec": now - self.started_at,
+                },
+                "stream": {
+                    "ws_connected": state.ws_state == "CONNECTED",
+                    "ws_state": state.ws_state,
+                    "last_ws_msg_ts": last_msg_ts,
+                    "heartbeat_delay_ms": round(max(0.0, now_f - last_recv) * 1000.0, 1) if last_recv else 0.0,
+                    "last_tick_ts": state.last_tick_ts,
+                    "dropped_ticks_5m": windows["drops"]["5m"],
+                    "subscribed_symbols": len(state.subscribed_symbols),
+                },
+                "trading": {
+                    "open_positions": state.open_count(),
+                    "symbols": len(state.open_positions_by_symbol),
+                    "closes_5m": windows["closes"]["5m"],
+                },
+                "windows": windows,
+            },
+        }
+
+    def refresh(self) -> None:
+        self.body = json.dumps(self.build(time.time()), separators=(",", ":")).encode()
+
+    async def handle_state(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.body, content_type="application/json")
+
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    # registry collection off the loop, as with the old exporter thread
+    body, content_type = await asyncio.to_thread(render_metrics)
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+
+async def state_server_loop(
+    state: ManagerState,
+    log,
+    host: str = "127.0.0.1",
+    port: int = 9101,
+    refresh_sec: float = 1.0,
+    liveness_timeout_sec: int = 45,
+) -> None:
+    """Serve /internal/state (cached JSON) and /metrics (Prometheus) until cancelled."""
+    cache = StateCache(state, liveness_timeout_sec)
+    cache.refresh()
+
+    app = web.Application()
+    app.router.add_get("/internal/state", cache.handle_state)
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        log.info("TM state server on http://%s:%s (/internal/state, /metrics)", host, port)
+        while True:
+            await asyncio.sleep(refresh_sec)
+            try:
+                cache.refresh()
+            except Exception as exc:
+                tm_exceptions_total.inc()
+                log.warning("TM state refresh failed (%s)", exc)
+    finally:
+        await runner.cleanup()
@@ -1,73 +1,268 @@
 from __future__ import annotations
 
 import asyncio
+from typing import Any
 
 import aiosqlite
 
 from app.config import load_settings
 from app.db.trade_manager import (
+    Position,
     connect,
+    connect_signals,
+    existing_signal_keys,
     fetch_new_signals,
     get_cursor,
-    has_open_position_for_symbol,
-    insert_virtual_position_from_signal,
+    get_data_version,
+    insert_virtual_positions_from_signals,
+    load_open_excursions,
     load_open_positions,
+    max_signal_id,
     set_cursor,
+    signal_key_for,
 )
+from app.metrics_tm import tm_exceptions_total
+from app.signal_notify import close_signal_listener, open_signal_listener
 from app.trade_manager.state import ManagerState
 
 
-async def sync_open_positions_cache(state: ManagerState) -> None:
-    conn = await connect()
+async def sync_open_positions_cache(state: ManagerState, conn: aiosqlite.Connection | None = None) -> None:
+    """Full reload of OPEN positions (startup only; ingest applies deltas)."""
+    owns_conn = conn is None
+    if conn is None:
+        conn = await connect()
     try:
         open_positions = await load_open_positions(conn)
+        excursions = await load_open_excursions(conn)
     finally:
-        await conn.close()
+        if owns_conn:
+            await conn.close()
 
-    grouped: dict[str, list] = {}
-    for p in open_positions:
-        grouped.setdefault(p.symbol, []).append(p)
+    async with state.global_lock:
+        state.replace_positions_unlocked(open_positions)
+    state.excursions.load(excursions)
+
+
+class SignalHandoff:
+    """
+    In-process engine -> trade manager signal queue (combined runner).
+
+    push() is the engine's signal sink (app.signals.set_signal_sink); rows
+    are already committed to signals.db. `ready` doubles as the ingest
+    wakeup event, so a push and a socket datagram wake the same loop.
+    """
+
+    def __init__(self) -> None:
+        self.rows: list[dict[str, Any]] = []
+        self.ready = asyncio.Event()
+
+    def push(self, row: dict[str, Any]) -> None:
+        self.rows.append(row)
+        self.ready.set()
+
+    def drain(self) -> list[dict[str, Any]]:
+        rows, self.rows = self.rows, []
+        return rows
 
+
+async def apply_opened_positions(state: ManagerState, positions: list[Position]) -> None:
+    """Add freshly opened positions to the cache without a full reload."""
+    if not positions:
+        return
     async with state.global_lock:
-        state.open_positions_by_symbol = grouped
+        state.add_positions_unlocked(positions)
 
 
-async def ingest_once(state: ManagerState, batch_size: int, log) -> int:
-    settings = load_settings(require_keys=False)
-    conn_tm = await connect()
-    conn_signals = await aiosqlite.connect(settings.signals_db)
-    conn_signals.row_factory = aiosqlite.Row
-    inserted_count = 0
+async def _ingest_batch(
+    state: ManagerState,
+    batch_size: int,
+    log,
+    conn_tm: aiosqlite.Connection,
+    conn_signals: aiosqlite.Connection,
+    max_open_per_symbol: int = 1,
+) -> tuple[int, int]:
+    """
+    Return (fetched_rows, inserted_positions).
+    Open/ignore is decided against the in-memory cache, so a batch costs
+    one executemany for positions and one for events, not a query per row.
+    """
+    cursor = await get_cursor(conn_tm)
+    rows = await fetch_new_signals(conn_signals, after_id=cursor, limit=batch_size)
+    if not rows:
+        return 0, 0
+    return len(rows), await _open_from_rows(state, rows, log, conn_tm, max_open_per_symbol)
+
+
+async def _ingest_handoff(
+    state: ManagerState,
+    rows: list[dict[str, Any]],
+    log,
+    conn_tm: aiosqlite.Connection,
+    max_open_per_symbol: int = 1,
+) -> int | None:
+    """
+    Open positions from handed-off rows without reading signals.db and
+    return the new cursor. Only done when the ids continue the cursor with
+    no gap (a gap means rows from another writer or a lost handoff);
+    otherwise return None and leave everything to the signals.db path,
+    which has the rows too.
+    """
+    cursor = await get_cursor(conn_tm)
+    rows = sorted((r for r in rows if int(r["id"]) > cursor), key=lambda r: int(r["id"]))
+    if not rows:
+        return cursor
+    if any(int(r["id"]) != cursor + 1 + i for i, r in enumerate(rows)):
+        return None
+    await _open_from_rows(state, rows, log, conn_tm, max_open_per_symbol)
+    return int(rows[-1]["id"])
+
+
+async def _open_from_rows(
+    state: ManagerState,
+    rows: list,
+    log,
+    conn_tm: aiosqlite.Connection,
+    max_open_per_symbol: int = 1,
+) -> int:
+    """Open positions for signal rows (ascending id) and move the cursor past them. Return opened."""
+    open_counts = {row["symbol"]: len(state.positions_for(row["symbol"])) for row in rows}
+    # INSERT OR IGNORE drops known signal_keys; skip them up front so a
+    # re-sent signal does not take its symbol's slot from a new one.
+    seen = await existing_signal_keys(conn_tm, (signal_key_for(row) for row in rows))
+
+    to_open = []
+    for row in rows:
+        key = signal_key_for(row)
+        if key in seen:
+            continue
+        seen.add(key)
+        symbol = row["symbol"]
+        if open_counts[symbol] >= max_open_per_symbol:
+            log.info("TM IGNORE_OPEN_EXISTS symbol=%s signal_id=%s", symbol, row["id"])
+            continue
+        open_counts[symbol] += 1
+        to_open.append(row)
+
+    opened = await insert_virtual_positions_from_signals(conn_tm, to_open)
+    await set_cursor(conn_tm, int(rows[-1]["id"]))
+    await conn_tm.commit()
+
+    for p in opened:
+        log.info("TM OPENED symbol=%s pos_id=%s signal_key=%s", p.symbol, p.id, p.signal_key)
+    await apply_opened_positions(state, opened)
+    return len(opened)
+
+
+async def ingest_once(
+    state: ManagerState,
+    batch_size: int,
+    log,
+    conn_tm: aiosqlite.Connection | None = None,
+    conn_signals: aiosqlite.Connection | None = None,
+    max_open_per_symbol: int = 1,
+) -> int:
+    owns_tm = conn_tm is None
+    owns_signals = conn_signals is None
+    if conn_tm is None:
+        conn_tm = await connect()
+    if conn_signals is None:
+        conn_signals = await connect_signals()
     try:
-        cursor = await get_cursor(conn_tm)
-        rows = await fetch_new_signals(conn_signals, after_id=cursor, limit=batch_size)
-        if not rows:
-            return 0
-
-        last_id = cursor
-        for row in rows:
-            last_id = int(row["id"])
-            symbol = row["symbol"]
-            if await has_open_position_for_symbol(conn_tm, symbol):
-                log.info("TM IGNORE_OPEN_EXISTS symbol=%s signal_id=%s", symbol, row["id"])
-                continue
-
-            inserted = await insert_virtual_position_from_signal(conn_tm, row)
-            if inserted:
-                inserted_count += 1
-                log.info("TM OPENED symbol=%s signal_id=%s", symbol, row["id"])
-
-        await set_cursor(conn_tm, last_id)
-        await conn_tm.commit()
-        await sync_open_positions_cache(state)
+        _, inserted_count = await _ingest_batch(
+            state, batch_size, log, conn_tm, conn_signals, max_open_per_symbol=max_open_per_symbol
+        )
         return inserted_count
     finally:
-        await conn_signals.close()
-        await conn_tm.close()
+        if owns_signals:
+            await conn_signals.close()
+        if owns_tm:
+            await conn_tm.close()
 
 
-async def ingest_loop(state: ManagerState, batch_size: int, poll_sec: float, log) -> None:
-    while True:
-        inserted_count = await ingest_once(state, batch_size=batch_size, log=log)
-        if inserted_count == 0:
-            await asyncio.sleep(poll_sec)
+async def ingest_loop(
+    state: ManagerState,
+    batch_size: int,
+    poll_sec: float,
+    log,
+    fallback_poll_sec: float | None = None,
+    max_open_per_symbol: int = 1,
+    handoff: SignalHandoff | None = None,
+) -> None:
+    """
+    Ingest new signals as soon as the engine pings the wakeup socket.
+    Polling stays as a fallback: every `poll_sec`, or `fallback_poll_sec`
+    while the socket is bound.
+
+    Connections are long-lived; `PRAGMA data_version` on the signals
+    connection makes an idle wakeup/poll cost one pragma, not a query.
+
+    With `handoff` (combined runner) rows pushed by the in-process engine
+    are opened directly and signals.db is not fetched for them (one MAX(id)
+    check instead). It is read whenever they do not continue the cursor,
+    or when data_version moved for rows that were not handed off.
+    """
+    settings = load_settings(require_keys=False)
+    wakeup = handoff.ready if handoff is not None else asyncio.Event()
+    transport = await open_signal_listener(settings.signals_notify_sock, wakeup)
+    if transport is None:
+        log.warning("TM signal wakeup socket unavailable, polling every %ss", poll_sec)
+    else:
+        poll_sec = max(poll_sec, fallback_poll_sec or poll_sec)
+
+    conn_tm: aiosqlite.Connection | None = None
+    conn_signals: aiosqlite.Connection | None = None
+    last_version: int | None = None
+    caught_up = False
+    try:
+        while True:
+            wakeup.clear()
+            try:
+                if conn_tm is None:
+                    conn_tm = await connect()
+                if conn_signals is None:
+                    conn_signals = await connect_signals()
+                    last_version = None
+
+                version = await get_data_version(conn_signals)
+                handed = handoff.drain() if handoff is not None else []
+                if handed and caught_up:
+                    cursor = await _ingest_handoff(
+                        state, handed, log, conn_tm, max_open_per_symbol=max_open_per_symbol
+                    )
+                    caught_up = cursor is not None
+                    # `version` counts the handed-off rows (committed before
+                    # push()) and maybe another writer's; skip the fetch only
+                    # if signals.db holds nothing past the cursor
+                    if caught_up and await max_signal_id(conn_signals) <= cursor:
+                        last_version = version
+
+                if version != last_version or not caught_up:
+                    fetched, _ = await _ingest_batch(
+                        state, batch_size, log, conn_tm, conn_signals, max_open_per_symbol=max_open_per_symbol
+                    )
+                    last_version = version
+                    caught_up = fetched < batch_size
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                tm_exceptions_total.inc()
+                log.warning("TM ingest error (%s), reopening connections", exc)
+                for conn in (conn_tm, conn_signals):
+                    if conn is not None:
+                        try:
+                            await conn.close()
+                        except Exception:
+                            pass
+                conn_tm = conn_signals = None
+                caught_up = True
+
+            if caught_up:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=poll_sec)
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        close_signal_listener(transport, settings.signals_notify_sock)
+        for conn in (conn_tm, conn_signals):
+            if conn is not None:
+                await conn.close()
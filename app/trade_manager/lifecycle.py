@@ -1,32 +1,108 @@
 from __future__ import annotations
 
 import asyncio
+from pathlib import Path
 
+from app.config import load_settings
 from app.trade_manager.config import load_trade_manager_config
+from app.trade_manager.compaction import event_compaction_loop
 from app.trade_manager.health import health_loop
-from app.trade_manager.ingest import ingest_loop, ingest_once, sync_open_positions_cache
+from app.trade_manager.http_state import state_server_loop
+from app.trade_manager.ingest import SignalHandoff, ingest_loop, ingest_once, sync_open_positions_cache
+from app.trade_manager.rest_fallback import rest_fallback_loop
+from app.trade_manager.snapshot import restore_snapshot, snapshot_loop
 from app.trade_manager.state import ManagerState
+from app.trade_manager.writer import PositionWriter, excursion_flush_loop
 from app.trade_manager.ws_client import tick_worker_loop, ws_loop
 
 
-async def run_trade_manager(once: bool, log) -> None:
+async def run_trade_manager(once: bool, log, handoff: SignalHandoff | None = None) -> None:
     cfg = load_trade_manager_config()
-    state = ManagerState()
+    state = ManagerState.with_tick_workers(cfg.tick_workers)
+    state.excursions.hit_mode = cfg.trigger_price_mode
 
-    await sync_open_positions_cache(state)
+    snapshot_path = Path(cfg.snapshot_path) if cfg.snapshot_path else None
+    if snapshot_path is None:
+        snapshot_path = load_settings(require_keys=False).db_dir / "trade_manager.snapshot.json"
+    use_snapshot = not once and cfg.snapshot_sec > 0
+    if not (use_snapshot and await restore_snapshot(state, snapshot_path, log)):
+        await sync_open_positions_cache(state)
 
     if once:
-        await ingest_once(state, batch_size=cfg.ingest_batch_size, log=log)
+        await ingest_once(
+            state,
+            batch_size=cfg.ingest_batch_size,
+            max_open_per_symbol=cfg.max_open_per_symbol,
+            log=log,
+        )
         return
 
+    writer = PositionWriter(state, log=log)
+
+    optional_loops = []
+    if cfg.http_port > 0:
+        optional_loops.append(
+            state_server_loop(
+                state,
+                log=log,
+                host=cfg.http_host,
+                port=cfg.http_port,
+                refresh_sec=cfg.state_refresh_sec,
+                liveness_timeout_sec=cfg.liveness_timeout_sec,
+            )
+        )
+    if use_snapshot:
+        optional_loops.append(snapshot_loop(state, snapshot_path, cfg.snapshot_sec, log))
+    if cfg.excursion_flush_sec > 0:
+        optional_loops.append(excursion_flush_loop(state, writer, cfg.excursion_flush_sec, log))
+    if cfg.event_compact_sec > 0:
+        optional_loops.append(event_compaction_loop(cfg.event_compact_sec, cfg.event_retain_days, log))
+    if cfg.rest_fallback_poll_sec > 0:
+        optional_loops.append(
+            rest_fallback_loop(
+                state,
+                log=log,
+                poll_sec=cfg.rest_fallback_poll_sec,
+                stale_after_sec=cfg.rest_fallback_after_sec,
+            )
+        )
+
     await asyncio.gather(
-        ingest_loop(state, batch_size=cfg.ingest_batch_size, poll_sec=cfg.ingest_poll_sec, log=log),
-        ws_loop(state, ws_url=cfg.ws_url, hit_mode=cfg.trigger_price_mode, log=log),
-        tick_worker_loop(state, hit_mode=cfg.trigger_price_mode, log=log),
+        writer.run(),
+        ingest_loop(
+            state,
+            batch_size=cfg.ingest_batch_size,
+            poll_sec=cfg.ingest_poll_sec,
+            fallback_poll_sec=cfg.ingest_fallback_poll_sec,
+            max_open_per_symbol=cfg.max_open_per_symbol,
+            log=log,
+            handoff=handoff,
+        ),
+        ws_loop(
+            state,
+            ws_url=cfg.ws_url,
+            hit_mode=cfg.trigger_price_mode,
+            subscribe_batch=cfg.ws_subscribe_batch,
+            max_topics_per_conn=cfg.ws_max_topics_per_conn,
+            max_connections=cfg.ws_max_connections,
+            liveness_timeout_sec=cfg.liveness_timeout_sec,
+            proximity_pct=cfg.proximity_pct,
+            tape_path=cfg.tape_path,
+            writer=writer,
+            kline_catchup=cfg.kline_catchup,
+            catchup_concurrency=cfg.kline_catchup_concurrency,
+            log=log,
+        ),
+        *(
+            tick_worker_loop(state, hit_mode=cfg.trigger_price_mode, writer=writer, log=log, shard=i)
+            for i in range(len(state.tick_shards))
+        ),
         health_loop(
             state,
             log_interval_sec=cfg.health_log_sec,
             liveness_timeout_sec=cfg.liveness_timeout_sec,
             log=log,
+            writer=writer,
         ),
+        *optional_loops,
     )
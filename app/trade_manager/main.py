@@ -2,11 +2,11 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import signal
 
 from app.db.trade_manager import init_db
 from app.logger import setup_logger
 from app.trade_manager.lifecycle import run_trade_manager
-from app.metrics_tm import start_metrics_server
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -19,7 +19,10 @@ def build_parser() -> argparse.ArgumentParser:
 
 async def _run(args) -> None:
     log = setup_logger("trade_manager")
-    start_metrics_server(port=9101, addr="127.0.0.1")
+    # systemd stops with SIGTERM: cancel instead of dying so loops run their
+    # cleanup (final state snapshot, tape flush).
+    task = asyncio.current_task()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
     await init_db()
 
     once = bool(args.once)
@@ -31,7 +34,10 @@ async def _run(args) -> None:
 
 def main() -> None:
     args = build_parser().parse_args()
-    asyncio.run(_run(args))
+    try:
+        asyncio.run(_run(args))
+    except asyncio.CancelledError:
+        pass
 
 
 if __name__ == "__main__":
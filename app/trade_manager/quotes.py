@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+class Quote:
+    """
+    Per-symbol ticker record, updated in place by every snapshot/delta.
+
+    Bybit deltas only carry the fields that changed, so a delta without
+    bid1Price keeps the previous bid instead of producing an incomplete
+    quote. *_lo/*_hi hold the extremes seen since the last take(), so a
+    conflated evaluation still sees every price that crossed SL/TP.
+    """
+
+    __slots__ = (
+        "symbol",
+        "ts",
+        "recv_ts",
+        "msgs",
+        "last",
+        "bid",
+        "ask",
+        "last_lo",
+        "last_hi",
+        "bid_lo",
+        "bid_hi",
+        "ask_lo",
+        "ask_hi",
+    )
+
+    def __init__(
+        self,
+        symbol: str,
+        ts: int = 0,
+        last: float | None = None,
+        bid: float | None = None,
+        ask: float | None = None,
+    ) -> None:
+        self.symbol = symbol
+        self.ts = ts
+        self.recv_ts = 0.0
+        self.msgs = 0  # frames seen for the symbol, price-changing or not
+        self.last = self.last_lo = self.last_hi = last
+        self.bid = self.bid_lo = self.bid_hi = bid
+        self.ask = self.ask_lo = self.ask_hi = ask
+
+    def apply(self, item: dict[str, Any], ts: int, recv_ts: float = 0.0) -> bool:
+        """Merge one ticker payload. Return True if any price changed."""
+        # written out per field: this runs for every frame of every symbol
+        changed = False
+        raw = item.get("lastPrice")
+        if raw:
+            price = float(raw)
+            if price != self.last:
+                changed = True
+                self.last = price
+                if self.last_lo is None or price < self.last_lo:
+                    self.last_lo = price
+                if self.last_hi is None or price > self.last_hi:
+                    self.last_hi = price
+        raw = item.get("bid1Price")
+        if raw:
+            price = float(raw)
+            if price != self.bid:
+                changed = True
+                self.bid = price
+                if self.bid_lo is None or price < self.bid_lo:
+                    self.bid_lo = price
+                if self.bid_hi is None or price > self.bid_hi:
+                    self.bid_hi = price
+        raw = item.get("ask1Price")
+        if raw:
+            price = float(raw)
+            if price != self.ask:
+                changed = True
+                self.ask = price
+                if self.ask_lo is None or price < self.ask_lo:
+                    self.ask_lo = price
+                if self.ask_hi is None or price > self.ask_hi:
+                    self.ask_hi = price
+        if changed:
+            self.ts = ts
+            self.recv_ts = recv_ts
+        return changed
+
+    def take(self) -> "Quote":
+        """Snapshot for evaluation, then restart the lo/hi window at current prices."""
+        snap = Quote.__new__(Quote)
+        for attr in Quote.__slots__:
+            setattr(snap, attr, getattr(self, attr))
+        self.reset_window()
+        return snap
+
+    def reset_window(self) -> None:
+        # an empty window (restored price, no frame since) stays empty
+        if self.last_lo is not None:
+            self.last_lo = self.last_hi = self.last
+        if self.bid_lo is not None:
+            self.bid_lo = self.bid_hi = self.bid
+        if self.ask_lo is not None:
+            self.ask_lo = self.ask_hi = self.ask
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"symbol": self.symbol, "ts": self.ts, "last": self.last, "bid": self.bid, "ask": self.ask}
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from app.bybit.rest import BybitREST
+from app.metrics_tm import tm_exceptions_total, tm_rest_fallback_active, tm_rest_fallback_polls_total
+from app.trade_manager.quotes import Quote
+from app.trade_manager.state import ManagerState
+
+
+def _ws_degraded(state: ManagerState, now: int, down_since: int, stale_after_sec: float) -> bool:
+    if state.ws_state != "CONNECTED":
+        return (now - down_since) > stale_after_sec
+    return bool(state.last_heartbeat_ts) and (now - state.last_heartbeat_ts) > stale_after_sec
+
+
+def apply_rest_tickers(state: ManagerState, tickers: list[dict], recv_ts: float) -> int:
+    """
+    Merge one /v5/market/tickers response into the Quote records of symbols
+    with open positions and queue the changed ones. Return quotes queued.
+    """
+    ts = int(recv_ts)
+    quotes = state.last_quote_by_symbol
+    queued = 0
+    for item in tickers:
+        symbol = item.get("symbol")
+        if not symbol or symbol not in state.triggers_by_symbol:
+            continue
+        quote = quotes.get(symbol)
+        if quote is None:
+            quote = quotes[symbol] = Quote(symbol)
+        if quote.apply(item, ts, recv_ts):
+            state.excursions.observe(quote)
+            state.shard_for(symbol).put(quote)
+            queued += 1
+    return queued
+
+
+async def rest_fallback_loop(
+    state: ManagerState,
+    log,
+    poll_sec: float = 2.0,
+    stale_after_sec: float = 10.0,
+    client: BybitREST | None = None,
+) -> None:
+    """
+    Degraded mode: while the WS feed is down or silent for `stale_after_sec`
+    (so a normal connect or short reconnect does not trigger it),
+    poll all linear tickers once per `poll_sec` and feed them to the tick
+    workers like WS quotes. One request covers every open symbol.
+    """
+    owns_client = client is None
+    if client is None:
+        client = BybitREST()
+    active = False
+    down_since = int(time.time())
+    try:
+        while True:
+            now = int(time.time())
+            if state.ws_state == "CONNECTED":
+                down_since = now
+            degraded = _ws_degraded(state, now, down_since, stale_after_sec) and bool(state.triggers_by_symbol)
+
+            if degraded != active:
+                active = degraded
+                tm_rest_fallback_active.set(1 if active else 0)
+                if active:
+                    log.warning("TM REST fallback ON ws=%s, polling tickers every %ss", state.ws_state, poll_sec)
+                else:
+                    log.info("TM REST fallback OFF, WS feed recovered")
+
+            if active:
+                try:
+                    tickers = await client.get_tickers_linear()
+                    queued = apply_rest_tickers(state, tickers, time.time())
+                    tm_rest_fallback_polls_total.inc()
+                    log.info("TM REST fallback poll tickers=%s queued=%s", len(tickers), queued)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    tm_exceptions_total.inc()
+                    log.warning("TM REST fallback poll failed (%s)", exc)
+
+            await asyncio.sleep(poll_sec)
+    finally:
+        tm_rest_fallback_active.set(0)
+        if owns_client:
+            await client.close()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+
+WINDOWS = (("1m", 60), ("5m", 300), ("15m", 900))
+
+
+class RollingCounter:
+    """
+    Event count over sliding windows: a ring of per-second buckets.
+
+    add() is O(1): it touches one bucket, resetting it first if it still
+    holds a count from a previous lap of the ring. Windows are summed only
+    when read (once per state refresh), never on the hot path.
+    """
+
+    __slots__ = ("_counts", "_stamps", "_size")
+
+    def __init__(self, horizon_sec: int = WINDOWS[-1][1]) -> None:
+        self._size = horizon_sec
+        self._counts = [0] * horizon_sec
+        self._stamps = [-1] * horizon_sec
+
+    def add(self, n: int = 1, now: float | None = None) -> None:
+        sec = int(time.time() if now is None else now)
+        i = sec % self._size
+        if self._stamps[i] != sec:
+            self._stamps[i] = sec
+            self._counts[i] = n
+        else:
+            self._counts[i] += n
+
+    def totals(self, now: float | None = None) -> dict[str, int]:
+        """Counts over each of WINDOWS, including the current second."""
+        sec = int(time.time() if now is None else now)
+        out = {name: 0 for name, _ in WINDOWS}
+        for stamp, count in zip(self._stamps, self._counts):
+            age = sec - stamp
+            if 0 <= age < self._size and count:
+                for name, span in WINDOWS:
+                    if age < span:
+                        out[name] += count
+        return out
+
+
+class RollingStats:
+    """The trade manager's windowed counters, kept on ManagerState."""
+
+    __slots__ = ("messages", "evals", "closes", "drops")
+
+    def __init__(self) -> None:
+        self.messages = RollingCounter()  # WS frames received
+        self.evals = RollingCounter()  # quotes evaluated by tick workers
+        self.closes = RollingCounter()  # closes committed
+        self.drops = RollingCounter()  # frames/quotes lost (bad JSON, failed evaluation)
+
+    def totals(self, now: float | None = None) -> dict[str, dict[str, int]]:
+        return {name: getattr(self, name).totals(now) for name in self.__slots__}
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Any
+
+import aiosqlite
+
+from app.db.trade_manager import (
+    Position,
+    connect,
+    load_open_excursions,
+    load_open_position_ids,
+    load_positions_by_ids,
+)
+from app.metrics_tm import tm_exceptions_total
+from app.trade_manager.quotes import Quote
+from app.trade_manager.state import ManagerState
+
+SNAPSHOT_VERSION = 1
+_POSITION_FIELDS = tuple(f.name for f in fields(Position))
+
+
+def build_snapshot(state: ManagerState) -> dict[str, Any]:
+    """Plain-data copy of the state worth keeping across a restart (no awaits)."""
+    state.excursions.fold_all(state.open_positions_by_symbol)
+    return {
+        "v": SNAPSHOT_VERSION,
+        "saved_at": int(time.time()),
+        "last_heartbeat_ts": state.last_heartbeat_ts,
+        "last_tick_ts": state.last_tick_ts,
+        "fields": _POSITION_FIELDS,
+        "positions": [
+            [getattr(p, f) for f in _POSITION_FIELDS]
+            for group in state.open_positions_by_symbol.values()
+            for p in group.values()
+        ],
+        "quotes": {
+            q.symbol: [q.ts, q.last, q.bid, q.ask]
+            for q in state.last_quote_by_symbol.values()
+            if q.symbol in state.open_positions_by_symbol
+        },
+        "subscribed": sorted(state.subscribed_symbols),
+        "excursions": {str(pos_id): exc.as_list() for pos_id, exc in state.excursions.by_pos.items()},
+    }
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+async def write_snapshot(state: ManagerState, path: Path) -> None:
+    snap = build_snapshot(state)
+    data = json.dumps(snap, separators=(",", ":")).encode()
+    await asyncio.to_thread(_write_atomic, path, data)
+
+
+def read_snapshot(path: Path) -> dict[str, Any] | None:
+    try:
+        snap = json.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    if snap.get("v") != SNAPSHOT_VERSION or tuple(snap.get("fields", ())) != _POSITION_FIELDS:
+        return None
+    return snap
+
+
+async def restore_snapshot(
+    state: ManagerState,
+    path: Path,
+    log,
+    conn: aiosqlite.Connection | None = None,
+) -> bool:
+    """
+    Load positions and quotes from the snapshot, reconciled with the DB:
+    positions no longer OPEN are dropped, OPEN ones missing from the
+    snapshot are loaded. Return False if there is no usable snapshot.
+    """
+    try:
+        snap = await asyncio.to_thread(read_snapshot, path)
+    except Exception as exc:
+        tm_exceptions_total.inc()
+        log.warning("TM snapshot unreadable (%s), full reload", exc)
+        return False
+    if snap is None:
+        return False
+
+    owns_conn = conn is None
+    if conn is None:
+        conn = await connect()
+    try:
+        open_ids = await load_open_position_ids(conn)
+        positions = [Position(*row) for row in snap["positions"]]
+        kept = [p for p in positions if p.id in open_ids]
+        missing = open_ids - {p.id for p in kept}
+        loaded = await load_positions_by_ids(conn, missing)
+        # kept positions carry newer excursions in the snapshot itself
+        excursions = await load_open_excursions(conn, missing)
+    finally:
+        if owns_conn:
+            await conn.close()
+
+    async with state.global_lock:
+        state.replace_positions_unlocked(kept + loaded)
+    # the snapshot is newer than the last flush to the DB
+    excursions.update((int(k), v) for k, v in snap.get("excursions", {}).items() if int(k) in open_ids)
+    state.excursions.load(excursions)
+    for symbol, (ts, last, bid, ask) in snap["quotes"].items():
+        # prices only: the lo/hi windows stay empty until a fresh frame, so
+        # minutes-old prices are never checked against SL/TP
+        quote = Quote(symbol, ts=ts)
+        quote.last, quote.bid, quote.ask = last, bid, ask
+        state.last_quote_by_symbol[symbol] = quote
+    state.last_heartbeat_ts = int(snap.get("last_heartbeat_ts") or 0)
+    state.last_tick_ts = int(snap.get("last_tick_ts") or 0)
+
+    log.info(
+        "TM snapshot restored age=%ss kept=%s dropped=%s loaded=%s",
+        int(time.time()) - int(snap["saved_at"]),
+        len(kept),
+        len(positions) - len(kept),
+        len(loaded),
+    )
+    return True
+
+
+async def snapshot_loop(state: ManagerState, path: Path, interval_sec: float, log) -> None:
+    try:
+        while True:
+            await asyncio.sleep(interval_sec)
+            try:
+                await write_snapshot(state, path)
+            except Exception as exc:
+                tm_exceptions_total.inc()
+                log.warning("TM snapshot write failed (%s)", exc)
+    finally:
+        # best effort on shutdown (cancellation), so a clean restart loses nothing
+        try:
+            _write_atomic(path, json.dumps(build_snapshot(state), separators=(",", ":")).encode())
+        except Exception:
+            pass
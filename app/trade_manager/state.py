@@ -1,32 +1,140 @@
 from __future__ import annotations
 
 import asyncio
+import zlib
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Iterable
 
 from app.db.trade_manager import Position
+from app.metrics_tm import tm_dropped_ticks_total
+from app.trade_manager.conflate import TickConflator
+from app.trade_manager.excursions import ExcursionBook
+from app.trade_manager.quotes import Quote
+from app.trade_manager.rolling import RollingStats
+from app.trade_manager.triggers import TriggerIndex
+
+_COMPACT_MIN_DEAD = 64
 
 
 @dataclass
 class ManagerState:
-    open_positions_by_symbol: dict[str, list[Position]] = field(default_factory=dict)
-    last_quote_by_symbol: dict[str, dict[str, Any]] = field(default_factory=dict)
+    """
+    Concurrency model (single event loop, no threads):
+    - Hot-path fields are written only by the WS pool and read without
+      locks: last_quote_by_symbol, subscribed_symbols, ws_state,
+      last_heartbeat_ts, last_tick_ts. health_loop sets force_reconnect,
+      the pool clears it.
+    - open_positions_by_symbol maps symbol -> {position id: Position} and
+      triggers_by_symbol the matching TriggerIndex. Closing removes the ids
+      from both in O(1) (TriggerIndex.discard); opening rebuilds the index
+      of that symbol only. Groups are mutated in place, so direct readers
+      must not hold one across an await; positions_for() returns a copy.
+    - The WS side only queues a quote to its shard when is_near_trigger()
+      says it may cross a level; other quotes just update the Quote record
+      and the excursions window (MAE/MFE, see ExcursionBook).
+    - rolling holds 1m/5m/15m counters (RollingStats); each counter is
+      added to from one place and only summed by the state refresh timer.
+    - global_lock only guards membership changes (open/close/reload), via
+      the *_unlocked helpers below.
+    """
+
+    open_positions_by_symbol: dict[str, dict[int, Position]] = field(default_factory=dict)
+    triggers_by_symbol: dict[str, TriggerIndex] = field(default_factory=dict)
+    last_quote_by_symbol: dict[str, Quote] = field(default_factory=dict)
     subscribed_symbols: set[str] = field(default_factory=set)
-    symbol_locks: dict[str, asyncio.Lock] = field(default_factory=dict)
     global_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
-    tick_queue: asyncio.Queue[dict[str, Any]] = field(default_factory=lambda: asyncio.Queue(maxsize=5000))
+    # Set when a symbol gains its first or loses its last open position.
+    subscriptions_changed: asyncio.Event = field(default_factory=asyncio.Event)
+    # One conflator per tick worker; a symbol always maps to the same shard,
+    # which keeps per-symbol ordering without per-symbol locks. Workers are
+    # coroutines on this loop: more shards interleave symbols, they do not
+    # add CPU throughput.
+    tick_shards: list[TickConflator] = field(default_factory=lambda: [TickConflator()])
     dropped_ticks: int = 0
     ws_state: str = "DISCONNECTED"
     last_heartbeat_ts: int = 0
+    last_msg_recv_ts: float = 0.0  # wall clock of the last WS frame, sub-second
     last_tick_ts: int = 0
     force_reconnect: bool = False
+    excursions: ExcursionBook = field(default_factory=ExcursionBook)
+    rolling: RollingStats = field(default_factory=RollingStats)
+    _shard_by_symbol: dict[str, TickConflator] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def with_tick_workers(cls, n: int) -> "ManagerState":
+        return cls(tick_shards=[TickConflator() for _ in range(max(1, int(n)))])
+
+    def shard_for(self, symbol: str) -> TickConflator:
+        shard = self._shard_by_symbol.get(symbol)
+        if shard is None:
+            # crc32 rather than hash(): stable across processes and restarts
+            shard = self.tick_shards[zlib.crc32(symbol.encode()) % len(self.tick_shards)]
+            self._shard_by_symbol[symbol] = shard
+        return shard
+
+    def note_drop(self, n: int = 1) -> None:
+        self.dropped_ticks += n
+        tm_dropped_ticks_total.inc(n)
+        self.rolling.drops.add(n)
+
+    def positions_for(self, symbol: str) -> tuple[Position, ...]:
+        """A copy: safe to keep across awaits, unlike the live group."""
+        group = self.open_positions_by_symbol.get(symbol)
+        return tuple(group.values()) if group is not None else ()
+
+    def open_count(self) -> int:
+        return sum(len(v) for v in self.open_positions_by_symbol.values())
+
+    def _set_symbol_unlocked(self, symbol: str, group: dict[int, Position]) -> None:
+        had_symbol = symbol in self.open_positions_by_symbol
+        if group:
+            self.open_positions_by_symbol[symbol] = group
+            self.triggers_by_symbol[symbol] = TriggerIndex(group.values())
+        else:
+            self.open_positions_by_symbol.pop(symbol, None)
+            self.triggers_by_symbol.pop(symbol, None)
+        if had_symbol != bool(group):
+            self.subscriptions_changed.set()
+
+    def replace_positions_unlocked(self, positions: Iterable[Position]) -> None:
+        grouped: dict[str, dict[int, Position]] = {}
+        for p in positions:
+            grouped.setdefault(p.symbol, {})[p.id] = p
+        self.open_positions_by_symbol = {}
+        self.triggers_by_symbol = {}
+        for symbol, group in grouped.items():
+            self._set_symbol_unlocked(symbol, group)
+        self.subscriptions_changed.set()
+
+    def add_positions_unlocked(self, positions: Iterable[Position]) -> None:
+        grouped: dict[str, list[Position]] = {}
+        for p in positions:
+            grouped.setdefault(p.symbol, []).append(p)
+        for symbol, added in grouped.items():
+            group = self.open_positions_by_symbol.get(symbol, {})
+            fresh = [p for p in added if p.id not in group]
+            if fresh:
+                self.excursions.fold(symbol, group.values())
+                group.update((p.id, p) for p in fresh)
+                self._set_symbol_unlocked(symbol, group)
 
-    def get_symbol_lock(self, symbol: str) -> asyncio.Lock:
-        lock = self.symbol_locks.get(symbol)
-        if lock is None:
-            lock = asyncio.Lock()
-            self.symbol_locks[symbol] = lock
-        return lock
+    def remove_positions_unlocked(self, symbol: str, pos_ids: set[int]) -> None:
+        group = self.open_positions_by_symbol.get(symbol)
+        if group is None:
+            return
+        self.excursions.fold(symbol, group.values())
+        for pos_id in pos_ids:
+            group.pop(pos_id, None)
+        if not group:
+            self._set_symbol_unlocked(symbol, group)
+            return
+        index = self.triggers_by_symbol[symbol]
+        if len(index.dead) + len(pos_ids) > max(_COMPACT_MIN_DEAD, len(group)):
+            # mostly dead entries: rebuild so crossed() stops skipping them
+            self.triggers_by_symbol[symbol] = TriggerIndex(group.values())
+        else:
+            index.discard(pos_ids)
 
     def desired_subscriptions_unlocked(self) -> set[str]:
-        return {s for s, positions in self.open_positions_by_symbol.items() if positions}
+        # symbols without positions are popped, so the keys are the desired set
+        return set(self.open_positions_by_symbol)
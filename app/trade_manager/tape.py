@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import struct
+import time
+from pathlib import Path
+from typing import Iterator
+
+# File = MAGIC, then records of <recv_ts_ns:int64><length:uint32><raw frame bytes>.
+MAGIC = b"TMTAPE1\n"
+_HEADER = struct.Struct("<qI")
+
+
+class TapeRecorder:
+    """
+    Append-only recorder of raw WS frames with their receive time.
+    Writes are buffered; flush() is called from the pool's 1s loop.
+    """
+
+    def __init__(self, path: str | Path, buffer_bytes: int = 1 << 20) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._fh = open(self.path, "ab", buffering=buffer_bytes)
+        if new_file:
+            self._fh.write(MAGIC)
+        self.frames = 0
+
+    def write(self, raw: str | bytes, recv_ts_ns: int | None = None) -> None:
+        data = raw.encode() if isinstance(raw, str) else raw
+        self._fh.write(_HEADER.pack(time.time_ns() if recv_ts_ns is None else recv_ts_ns, len(data)))
+        self._fh.write(data)
+        self.frames += 1
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def read_tape(path: str | Path) -> Iterator[tuple[int, bytes]]:
+    """Yield (recv_ts_ns, raw_frame). A truncated trailing record is ignored."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a tick tape")
+        while True:
+            header = fh.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            recv_ts_ns, length = _HEADER.unpack(header)
+            data = fh.read(length)
+            if len(data) < length:
+                return
+            yield recv_ts_ns, data
+
+
+def write_tape(path: str | Path, frames: Iterator[tuple[int, bytes]]) -> int:
+    """Write (recv_ts_ns, raw_frame) pairs to a new tape; return the frame count."""
+    Path(path).unlink(missing_ok=True)
+    recorder = TapeRecorder(path)
+    try:
+        for recv_ts_ns, raw in frames:
+            recorder.write(raw, recv_ts_ns)
+    finally:
+        recorder.close()
+    return recorder.frames
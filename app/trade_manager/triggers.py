@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+
+from app.db.trade_manager import Position
+
+
+def _sorted_levels(positions: list[Position], attr: str) -> tuple[list[float], list[Position]]:
+    ordered = sorted(positions, key=lambda p: getattr(p, attr))
+    return [float(getattr(p, attr)) for p in ordered], ordered
+
+
+class TriggerIndex:
+    """
+    Per-symbol SL/TP index: four sorted level arrays.
+
+    crossed() finds every position hit by a price range with four binary
+    searches, so positions whose levels were not reached cost nothing.
+    near() only compares against the innermost level on each side, which is
+    what lets the WS side skip queueing quotes far from every trigger.
+
+    Closes go through discard(): O(1) per position, the arrays are left as
+    they are and crossed() skips dead ids. Each *_end/*_start cursor marks
+    the innermost live entry of its array and only moves outwards, so
+    closing the usual innermost positions is amortized O(1) as well.
+    Rebuilt when positions are added (ManagerState also compacts once dead
+    entries outnumber live ones).
+    """
+
+    __slots__ = (
+        "long_sl",
+        "long_sl_pos",
+        "long_tp",
+        "long_tp_pos",
+        "short_sl",
+        "short_sl_pos",
+        "short_tp",
+        "short_tp_pos",
+        "long_floor",
+        "long_ceil",
+        "short_floor",
+        "short_ceil",
+        "dead",
+        "_long_sl_end",
+        "_long_tp_start",
+        "_short_sl_start",
+        "_short_tp_end",
+    )
+
+    def __init__(self, positions: Iterable[Position]) -> None:
+        longs: list[Position] = []
+        shorts: list[Position] = []
+        for p in positions:
+            side = p.side.upper()
+            if side == "LONG":
+                longs.append(p)
+            elif side == "SHORT":
+                shorts.append(p)
+        self.long_sl, self.long_sl_pos = _sorted_levels(longs, "sl")
+        self.long_tp, self.long_tp_pos = _sorted_levels(longs, "tp")
+        self.short_sl, self.short_sl_pos = _sorted_levels(shorts, "sl")
+        self.short_tp, self.short_tp_pos = _sorted_levels(shorts, "tp")
+        self.dead: set[int] = set()
+        self._long_sl_end = len(self.long_sl)
+        self._long_tp_start = 0
+        self._short_sl_start = 0
+        self._short_tp_end = len(self.short_tp)
+        self._set_bounds()
+
+    def _set_bounds(self) -> None:
+        # Innermost live levels: LONG hits at/below long_floor or at/above
+        # long_ceil, SHORT at/below short_floor (TP) or at/above short_ceil (SL).
+        self.long_floor = self.long_sl[self._long_sl_end - 1] if self._long_sl_end else -math.inf
+        self.long_ceil = self.long_tp[self._long_tp_start] if self._long_tp_start < len(self.long_tp) else math.inf
+        self.short_floor = self.short_tp[self._short_tp_end - 1] if self._short_tp_end else -math.inf
+        self.short_ceil = self.short_sl[self._short_sl_start] if self._short_sl_start < len(self.short_sl) else math.inf
+
+    def discard(self, pos_ids: Iterable[int]) -> None:
+        """Drop closed positions without rebuilding the arrays."""
+        dead = self.dead
+        dead.update(pos_ids)
+
+        end = self._long_sl_end
+        while end and self.long_sl_pos[end - 1].id in dead:
+            end -= 1
+        self._long_sl_end = end
+
+        start, n = self._long_tp_start, len(self.long_tp_pos)
+        while start < n and self.long_tp_pos[start].id in dead:
+            start += 1
+        self._long_tp_start = start
+
+        start, n = self._short_sl_start, len(self.short_sl_pos)
+        while start < n and self.short_sl_pos[start].id in dead:
+            start += 1
+        self._short_sl_start = start
+
+        end = self._short_tp_end
+        while end and self.short_tp_pos[end - 1].id in dead:
+            end -= 1
+        self._short_tp_end = end
+
+        self._set_bounds()
+
+    def near(
+        self,
+        long_lo: float,
+        long_hi: float,
+        short_lo: float,
+        short_hi: float,
+        margin: float = 0.0,
+    ) -> bool:
+        """True if a price range is within `margin` (fraction) of any level."""
+        return (
+            long_lo <= self.long_floor * (1.0 + margin)
+            or long_hi >= self.long_ceil * (1.0 - margin)
+            or short_lo <= self.short_floor * (1.0 + margin)
+            or short_hi >= self.short_ceil * (1.0 - margin)
+        )
+
+    def crossed(
+        self,
+        long_lo: float | None,
+        long_hi: float | None,
+        short_lo: float | None,
+        short_hi: float | None,
+    ) -> list[tuple[Position, str, float]]:
+        """
+        Return (position, "SL"|"TP", price) for every level reached.
+        LONG closes on the long price range, SHORT on the short one.
+        SL wins when a range reached both levels of one position.
+        """
+        hits: list[tuple[Position, str, float]] = []
+        sl_ids: set[int] = set()
+        dead = self.dead
+
+        if long_lo is not None:
+            # LONG SL: price <= sl  ->  all levels >= long_lo
+            end = self._long_sl_end
+            for p in self.long_sl_pos[bisect_left(self.long_sl, long_lo, 0, end) : end]:
+                if p.id not in dead:
+                    hits.append((p, "SL", long_lo))
+                    sl_ids.add(p.id)
+        if short_hi is not None:
+            # SHORT SL: price >= sl  ->  all levels <= short_hi
+            start = self._short_sl_start
+            for p in self.short_sl_pos[start : bisect_right(self.short_sl, short_hi, start)]:
+                if p.id not in dead:
+                    hits.append((p, "SL", short_hi))
+                    sl_ids.add(p.id)
+        if long_hi is not None:
+            # LONG TP: price >= tp  ->  all levels <= long_hi
+            start = self._long_tp_start
+            for p in self.long_tp_pos[start : bisect_right(self.long_tp, long_hi, start)]:
+                if p.id not in sl_ids and p.id not in dead:
+                    hits.append((p, "TP", long_hi))
+        if short_lo is not None:
+            # SHORT TP: price <= tp  ->  all levels >= short_lo
+            end = self._short_tp_end
+            for p in self.short_tp_pos[bisect_left(self.short_tp, short_lo, 0, end) : end]:
+                if p.id not in sl_ids and p.id not in dead:
+                    hits.append((p, "TP", short_lo))
+        return hits
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiosqlite
+
+from app.db.trade_manager import (
+    Position,
+    close_position_atomic,
+    connect,
+    event_row,
+    log_position_events,
+    update_excursions,
+)
+from app.metrics_tm import (
+    tm_closed_mae_pct,
+    tm_closed_mfe_pct,
+    tm_eval_to_commit_seconds,
+    tm_exceptions_total,
+)
+from app.trade_manager.excursions import Excursion
+from app.trade_manager.state import ManagerState
+
+
+@dataclass(frozen=True)
+class CloseRequest:
+    position: Position
+    close_reason: str
+    close_price: float
+    hit_source: str
+    tick_ts: int
+    bid: float | None = None
+    ask: float | None = None
+    recv_ts: float = 0.0  # wall-clock receive time of the closing tick
+    eval_ts: float = 0.0  # wall-clock time the hit was detected
+    excursion: Excursion | None = None  # final MAE/MFE (ExcursionBook.finish)
+
+
+@dataclass(frozen=True)
+class ExcursionUpdate:
+    rows: list[tuple[int, float, float, float, float, int]]  # ExcursionBook.take_dirty()
+
+
+class PositionWriter:
+    """
+    Single long-lived trade_manager.db writer for the tick path.
+    Closes queued while a commit is in flight are written together and
+    committed once (group commit), their CLOSED events with one
+    executemany. Periodic MAE/MFE flushes go through the
+    same queue, so they share commits with closes instead of competing
+    with them for the write lock.
+    """
+
+    def __init__(self, state: ManagerState, log, max_batch: int = 256, db_path: Path | None = None) -> None:
+        self.state = state
+        self.log = log
+        self.max_batch = max_batch
+        self.db_path = db_path
+        self.queue: asyncio.Queue[CloseRequest | ExcursionUpdate] = asyncio.Queue()
+
+    def submit_close(self, req: CloseRequest) -> None:
+        self.queue.put_nowait(req)
+
+    def submit_excursions(self, rows: list[tuple[int, float, float, float, float, int]]) -> None:
+        self.queue.put_nowait(ExcursionUpdate(rows))
+
+    async def _write(self, conn: aiosqlite.Connection, batch: list[CloseRequest | ExcursionUpdate]) -> None:
+        written: list[CloseRequest] = []
+        events: list[tuple] = []
+        for req in batch:
+            if isinstance(req, ExcursionUpdate):
+                await update_excursions(conn, req.rows)
+                continue
+            exc = req.excursion
+            ok = await close_position_atomic(
+                conn,
+                pos_id=req.position.id,
+                close_reason=req.close_reason,
+                close_price=req.close_price,
+                hit_source=req.hit_source,
+                tick_ts=req.tick_ts,
+                mae_pct=exc.mae_pct if exc is not None else None,
+                mfe_pct=exc.mfe_pct if exc is not None else None,
+                pnl_pct=exc.upnl_pct if exc is not None else None,
+            )
+            if not ok:
+                continue
+            written.append(req)
+            events.append(
+                event_row(
+                    req.position.id,
+                    "CLOSED",
+                    price=req.close_price,
+                    bid=req.bid,
+                    ask=req.ask,
+                    payload={"reason": req.close_reason, "source": req.hit_source},
+                )
+            )
+        await log_position_events(conn, events)
+        await conn.commit()
+
+        now = time.time()
+        if written:
+            self.state.rolling.closes.add(len(written), now)
+        for req in written:
+            if req.eval_ts:
+                tm_eval_to_commit_seconds.observe(max(0.0, now - req.eval_ts))
+            if req.excursion is not None:
+                tm_closed_mae_pct.observe(req.excursion.mae_pct)
+                tm_closed_mfe_pct.observe(req.excursion.mfe_pct)
+
+    async def _restore(self, batch: list[CloseRequest | ExcursionUpdate]) -> None:
+        """
+        Put positions back in the cache so a failed write is retried by the
+        next tick, with the MAE/MFE history finish() took from the book.
+        """
+        closes = [req for req in batch if isinstance(req, CloseRequest)]
+        book = self.state.excursions
+        async with self.state.global_lock:
+            self.state.add_positions_unlocked(req.position for req in closes)
+        for req in closes:
+            if req.excursion is not None:
+                book.restore(req.position, req.excursion)
+        for req in batch:
+            if isinstance(req, ExcursionUpdate):
+                book.mark_dirty(row[0] for row in req.rows)
+
+    async def run(self) -> None:
+        conn: aiosqlite.Connection | None = None
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                try:
+                    if conn is None:
+                        conn = await connect(self.db_path)
+                    await self._write(conn, batch)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    tm_exceptions_total.inc()
+                    self.log.warning("TM writer error (%s), restoring %s positions", exc, len(batch))
+                    if conn is not None:
+                        try:
+                            await conn.close()
+                        except Exception:
+                            pass
+                        conn = None
+                    await self._restore(batch)
+                finally:
+                    for _ in batch:
+                        self.queue.task_done()
+        finally:
+            if conn is not None:
+                await conn.close()
+
+
+async def excursion_flush_loop(state: ManagerState, writer: PositionWriter, interval_sec: float, log) -> None:
+    """Fold every symbol's price window and queue the changed MAE/MFE records as one batch."""
+    while True:
+        await asyncio.sleep(interval_sec)
+        try:
+            book = state.excursions
+            book.fold_all(state.open_positions_by_symbol)
+            open_ids = {pos_id for group in state.open_positions_by_symbol.values() for pos_id in group}
+            rows = book.take_dirty(open_ids)
+            book.publish()
+            if rows:
+                writer.submit_excursions(rows)
+        except Exception as exc:
+            tm_exceptions_total.inc()
+            log.warning("TM excursion flush failed (%s)", exc)
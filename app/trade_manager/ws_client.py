@@ -4,9 +4,35 @@ import asyncio
 import json
 import time
 
-from app.metrics_tm import tm_dropped_ticks_total, tm_exceptions_total, tm_reconnect_total
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # optional speedup, stdlib json is the fallback
+    _loads = json.loads
+
+from app.metrics_tm import (
+    tm_conflated_ticks_total,
+    tm_exceptions_total,
+    tm_exchange_to_recv_seconds,
+    tm_quiet_ticks_total,
+    tm_reconnect_total,
+    tm_recv_to_eval_seconds,
+    tm_ws_conn_connected,
+    tm_ws_conn_lag_seconds,
+    tm_ws_conn_last_msg_age_seconds,
+    tm_ws_conn_messages_total,
+    tm_ws_conn_reconnect_total,
+    tm_ws_conn_symbols,
+    tm_ws_connections,
+)
+from app.trade_manager.catchup import kline_catchup
+from app.trade_manager.evaluator import is_near_trigger
+from app.trade_manager.quotes import Quote
 from app.trade_manager.router import on_tick
 from app.trade_manager.state import ManagerState
+from app.trade_manager.tape import TapeRecorder
+from app.trade_manager.writer import PositionWriter
 
 
 def _topic_for(symbol: str) -> str:
@@ -19,7 +45,12 @@ def _normalize_ts(ts: int) -> int:
     return int(ts)
 
 
-def _parse_ticker(msg: dict) -> list[dict]:
+def _merge_ticker(quotes: dict[str, Quote], msg: dict, recv_ts: float = 0.0) -> list[Quote]:
+    """
+    Merge a tickers.* snapshot/delta into the per-symbol Quote records.
+    Return the quotes whose prices changed; deltas that only touch other
+    fields (volume, funding, ...) produce nothing to evaluate.
+    """
     topic = msg.get("topic", "")
     if not topic.startswith("tickers."):
         return []
@@ -30,132 +61,440 @@ def _parse_ticker(msg: dict) -> list[dict]:
     if not isinstance(payload, list):
         return []
 
-    out: list[dict] = []
+    changed: list[Quote] = []
     for item in payload:
         symbol = item.get("symbol")
         if not symbol:
             continue
 
+        quote = quotes.get(symbol)
+        if quote is None:
+            quote = quotes[symbol] = Quote(symbol)
+        quote.msgs += 1
         raw_ts = int(item.get("time") or item.get("timestamp") or msg.get("ts") or int(time.time()))
-        out.append(
-            {
-                "symbol": symbol,
-                "ts": _normalize_ts(raw_ts),
-                "last": float(item["lastPrice"]) if item.get("lastPrice") else None,
-                "bid": float(item["bid1Price"]) if item.get("bid1Price") else None,
-                "ask": float(item["ask1Price"]) if item.get("ask1Price") else None,
-            }
-        )
-    return out
+        if quote.apply(item, _normalize_ts(raw_ts), recv_ts):
+            changed.append(quote)
+    return changed
 
 
-async def _sync_subscriptions(ws, state: ManagerState) -> None:
-    async with state.global_lock:
-        desired = state.desired_subscriptions_unlocked()
-        subscribed = set(state.subscribed_symbols)
+def _chunks(items: list[str], size: int) -> list[list[str]]:
+    size = max(1, int(size))
+    return [items[i : i + size] for i in range(0, len(items), size)]
 
-    new_symbols = desired - subscribed
-    old_symbols = subscribed - desired
 
-    if new_symbols:
-        await ws.send(
-            json.dumps({"op": "subscribe", "args": [_topic_for(s) for s in sorted(new_symbols)]})
-        )
-        async with state.global_lock:
-            state.subscribed_symbols |= new_symbols
+async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+    # asyncio.wait, not wait_for: wait_for can swallow a cancel that lands
+    # as the event fires, which would leave the pool running after shutdown.
+    waiter = asyncio.ensure_future(event.wait())
+    try:
+        await asyncio.wait({waiter}, timeout=timeout)
+    finally:
+        waiter.cancel()
 
-    if old_symbols:
-        await ws.send(
-            json.dumps({"op": "unsubscribe", "args": [_topic_for(s) for s in sorted(old_symbols)]})
-        )
-        async with state.global_lock:
-            state.subscribed_symbols -= old_symbols
 
+_STATE_RANK = {"CONNECTED": 0, "CONNECTING": 1, "DISCONNECTED": 2}
 
-async def tick_worker_loop(state: ManagerState, hit_mode: str, log) -> None:
-    while True:
-        tick = await state.tick_queue.get()
+
+class WsConnection:
+    """
+    One socket of the pool: owns the symbols assigned to it, its own
+    reconnect/backoff, and its liveness/message-rate/lag stats.
+    """
+
+    def __init__(self, pool: "WsPool", conn_id: str) -> None:
+        self.pool = pool
+        self.conn_id = conn_id
+        self.symbols: set[str] = set()  # assigned by the pool
+        self.subscribed: set[str] = set()  # acknowledged by us on this socket
+        self.changed = asyncio.Event()
+        self.ws_state = "DISCONNECTED"
+        self.force_reconnect = False
+        # set with force_reconnect when the socket was not stale: the
+        # reconnect is deliberate, not an outage, so no kline catch-up
+        self.planned_reconnect = False
+        self.last_msg_ts = 0
+        self.lag_sec = 0.0
+        self.task: asyncio.Task | None = None
+        self._messages = tm_ws_conn_messages_total.labels(conn=conn_id)
+
+    async def _sync_subscriptions(self, ws) -> None:
+        new_symbols = sorted(self.symbols - self.subscribed)
+        old_symbols = sorted(self.subscribed - self.symbols)
+        batch_size = self.pool.subscribe_batch
+
+        for chunk in _chunks(new_symbols, batch_size):
+            await ws.send(json.dumps({"op": "subscribe", "args": [_topic_for(s) for s in chunk]}))
+            self.subscribed |= set(chunk)
+
+        for chunk in _chunks(old_symbols, batch_size):
+            await ws.send(json.dumps({"op": "unsubscribe", "args": [_topic_for(s) for s in chunk]}))
+            self.subscribed -= set(chunk)
+
+        if new_symbols or old_symbols:
+            self.pool.refresh_state()
+
+    async def _control_loop(self, ws) -> None:
+        """Off the receive path: apply subscription diffs, honour reconnect requests."""
+        log = self.pool.log
+        try:
+            while True:
+                self.changed.clear()
+                if self.force_reconnect:
+                    tm_reconnect_total.inc()
+                    tm_ws_conn_reconnect_total.labels(conn=self.conn_id).inc()
+                    log.warning("TM WS[%s] force reconnect triggered by liveness checker", self.conn_id)
+                    await ws.close()
+                    return
+                await self._sync_subscriptions(ws)
+                await self.changed.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            log.warning("TM WS[%s] control loop error (%s), closing socket", self.conn_id, exc)
+            await ws.close()
+
+    async def _catch_up(self, start_ts: int, end_ts: int) -> None:
+        """Replay the outage from 1m klines before reading live frames again."""
+        pool = self.pool
+        if not pool.kline_catchup or pool.writer is None:
+            return
         try:
-            await on_tick(state, tick["symbol"], tick, hit_mode)
+            closed = await kline_catchup(
+                pool.state,
+                set(self.symbols),
+                start_ts,
+                end_ts,
+                pool.writer,
+                pool.log,
+                concurrency=pool.catchup_concurrency,
+                hit_mode=pool.hit_mode,
+            )
         except Exception as exc:
             tm_exceptions_total.inc()
-            log.warning("TM tick worker error: %s", exc)
-        finally:
-            state.tick_queue.task_done()
+            pool.log.warning("TM WS[%s] kline catch-up failed (%s)", self.conn_id, exc)
+            return
+        pool.log.info(
+            "TM WS[%s] catch-up %ss gap, %s symbols, %s closed", self.conn_id, end_ts - start_ts, len(self.symbols), closed
+        )
 
+    async def run(self) -> None:
+        import websockets
 
-async def ws_loop(state: ManagerState, ws_url: str, hit_mode: str, log) -> None:
-    backoffs = [1, 2, 5, 10, 30]
-    attempt = 0
+        state = self.pool.state
+        log = self.pool.log
+        backoffs = [1, 2, 5, 10, 30]
+        attempt = 0
 
-    while True:
-        async with state.global_lock:
-            state.ws_state = "CONNECTING"
-        try:
-            import websockets
-
-            async with websockets.connect(ws_url, ping_interval=20, ping_timeout=20) as ws:
-                async with state.global_lock:
-                    state.ws_state = "CONNECTED"
-                    state.subscribed_symbols.clear()
-                    state.last_heartbeat_ts = int(time.time())
-                    state.force_reconnect = False
-                attempt = 0
-
-                while True:
-                    await _sync_subscriptions(ws, state)
-
-                    async with state.global_lock:
-                        force_reconnect = state.force_reconnect
-                    if force_reconnect:
-                        tm_reconnect_total.inc()
-                        log.warning("TM WS force reconnect triggered by liveness checker")
-                        break
+        while True:
+            self.ws_state = "CONNECTING"
+            self.pool.refresh_state()
+            # 0 until the first connect
+            gap_start = 0 if self.planned_reconnect else self.last_msg_ts
+            self.planned_reconnect = False
+            try:
+                async with websockets.connect(self.pool.ws_url, ping_interval=20, ping_timeout=20) as ws:
+                    self.ws_state = "CONNECTED"
+                    self.subscribed.clear()
+                    state.last_msg_recv_ts = time.time()
+                    self.last_msg_ts = state.last_heartbeat_ts = int(state.last_msg_recv_ts)
+                    self.force_reconnect = False
+                    attempt = 0
+                    self.pool.refresh_state()
 
+                    control = asyncio.create_task(self._control_loop(ws))
                     try:
-                        raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
-                    except asyncio.TimeoutError:
-                        continue
+                        if gap_start:
+                            await self._catch_up(gap_start, self.last_msg_ts)
 
-                    now = int(time.time())
-                    async with state.global_lock:
-                        state.last_heartbeat_ts = now
+                        # Receive loop: read and dispatch only.
+                        last_quotes = state.last_quote_by_symbol
+                        hit_mode = self.pool.hit_mode
+                        proximity = self.pool.proximity_pct
+                        tape = self.pool.tape
+                        observe_lag = tm_exchange_to_recv_seconds.observe
+                        observe_excursion = state.excursions.observe
+                        count_message = state.rolling.messages.add
+                        async for raw in ws:
+                            now = time.time()
+                            self.last_msg_ts = state.last_heartbeat_ts = int(now)
+                            state.last_msg_recv_ts = now
+                            self._messages.inc()
+                            count_message(1, now)
+                            if tape is not None:
+                                tape.write(raw, int(now * 1e9))
 
-                    try:
-                        msg = json.loads(raw)
-                    except json.JSONDecodeError:
-                        log.warning("TM WS received invalid JSON frame")
-                        continue
-
-                    for quote in _parse_ticker(msg):
-                        symbol = quote["symbol"]
-                        async with state.global_lock:
-                            state.last_quote_by_symbol[symbol] = quote
-                            state.last_tick_ts = int(quote["ts"])
-
-                        try:
-                            state.tick_queue.put_nowait(quote)
-                        except asyncio.QueueFull:
-                            tm_dropped_ticks_total.inc()
-                            async with state.global_lock:
-                                state.dropped_ticks += 1
+                            try:
+                                msg = _loads(raw)
+                            except ValueError:
+                                state.note_drop()
+                                log.warning("TM WS[%s] received invalid JSON frame", self.conn_id)
+                                continue
 
-        except asyncio.CancelledError:
-            raise
+                            exch_ts = msg.get("ts")
+                            if exch_ts:
+                                self.lag_sec = now - int(exch_ts) / 1000.0
+                                observe_lag(max(0.0, self.lag_sec))
+
+                            for quote in _merge_ticker(last_quotes, msg, now):
+                                state.last_tick_ts = quote.ts
+                                index = state.triggers_by_symbol.get(quote.symbol)
+                                if index is not None:
+                                    observe_excursion(quote)
+                                if index is None or not is_near_trigger(index, quote, hit_mode, proximity):
+                                    # nothing in the window crossed a level; a position
+                                    # opened later must not see these old extremes
+                                    quote.reset_window()
+                                    tm_quiet_ticks_total.inc()
+                                    continue
+                                if state.shard_for(quote.symbol).put(quote):
+                                    tm_conflated_ticks_total.inc()
+                    finally:
+                        control.cancel()
+
+                    if not self.force_reconnect:
+                        raise ConnectionError(f"closed by server code={ws.close_code}")
+
+            except asyncio.CancelledError:
+                self.ws_state = "DISCONNECTED"
+                self.subscribed.clear()
+                raise
+            except Exception as exc:
+                tm_exceptions_total.inc()
+                tm_reconnect_total.inc()
+                tm_ws_conn_reconnect_total.labels(conn=self.conn_id).inc()
+                self.ws_state = "DISCONNECTED"
+                self.subscribed.clear()
+                self.pool.refresh_state()
+                delay = backoffs[min(attempt, len(backoffs) - 1)]
+                attempt += 1
+                log.warning("TM WS[%s] disconnected (%s), retry in %ss", self.conn_id, exc, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.ws_state = "DISCONNECTED"
+                self.subscribed.clear()
+                self.force_reconnect = False
+                self.pool.refresh_state()
+                # closed intentionally (e.g. force reconnect)
+                await asyncio.sleep(0)
+
+
+class WsPool:
+    """
+    Spreads ticker topics over several sockets: at most `max_topics_per_conn`
+    symbols each, up to `max_connections` sockets. New symbols go to the
+    least-loaded socket with room; sockets left empty are closed.
+
+    ManagerState keeps the aggregate view: ws_state is the worst socket
+    state, subscribed_symbols the union, last_heartbeat_ts the latest frame.
+    """
+
+    def __init__(
+        self,
+        state: ManagerState,
+        ws_url: str,
+        log,
+        subscribe_batch: int = 10,
+        max_topics_per_conn: int = 200,
+        max_connections: int = 8,
+        liveness_timeout_sec: int = 45,
+        hit_mode: str = "bidask",
+        proximity_pct: float = 0.001,
+        tape_path: str = "",
+        writer: PositionWriter | None = None,
+        kline_catchup: bool = True,
+        catchup_concurrency: int = 8,
+    ) -> None:
+        self.state = state
+        self.ws_url = ws_url
+        self.log = log
+        self.hit_mode = hit_mode
+        self.proximity_pct = proximity_pct
+        self.tape_path = tape_path
+        self.tape: TapeRecorder | None = None
+        self.writer = writer
+        self.kline_catchup = kline_catchup
+        self.catchup_concurrency = catchup_concurrency
+        # Last frame time restored from a snapshot: the first sockets treat
+        # the restart as an outage and catch up from klines.
+        self._resume_from_ts = state.last_heartbeat_ts
+        self.subscribe_batch = subscribe_batch
+        self.max_topics_per_conn = max(1, int(max_topics_per_conn))
+        self.max_connections = max(1, int(max_connections))
+        self.liveness_timeout_sec = liveness_timeout_sec
+        self.connections: list[WsConnection] = []
+
+    def _spawn(self) -> WsConnection:
+        used = {c.conn_id for c in self.connections}
+        conn_id = next(str(i) for i in range(len(used) + 1) if str(i) not in used)
+        conn = WsConnection(self, conn_id)
+        conn.last_msg_ts = self._resume_from_ts
+        conn.task = asyncio.create_task(conn.run())
+        self.connections.append(conn)
+        return conn
+
+    def _retire(self, conn: WsConnection) -> None:
+        if conn.task is not None:
+            conn.task.cancel()
+        self.connections.remove(conn)
+        for metric in (tm_ws_conn_connected, tm_ws_conn_symbols, tm_ws_conn_last_msg_age_seconds, tm_ws_conn_lag_seconds):
+            try:
+                metric.remove(conn.conn_id)
+            except KeyError:
+                pass
+
+    def rebalance(self) -> None:
+        desired = self.state.desired_subscriptions_unlocked()
+        for conn in self.connections:
+            if conn.symbols - desired:
+                conn.symbols &= desired
+                conn.changed.set()
+
+        assigned = set().union(*(c.symbols for c in self.connections)) if self.connections else set()
+        for symbol in sorted(desired - assigned):
+            open_conns = [c for c in self.connections if len(c.symbols) < self.max_topics_per_conn]
+            if open_conns:
+                conn = min(open_conns, key=lambda c: len(c.symbols))
+            elif len(self.connections) < self.max_connections:
+                conn = self._spawn()
+            else:
+                conn = min(self.connections, key=lambda c: len(c.symbols))
+                self.log.warning("TM WS pool full, %s over topic cap on conn %s", symbol, conn.conn_id)
+            conn.symbols.add(symbol)
+            conn.changed.set()
+
+        for conn in list(self.connections):
+            if not conn.symbols and len(self.connections) > 1:
+                self._retire(conn)
+        if not self.connections:
+            self._spawn()
+        self._resume_from_ts = 0
+
+        tm_ws_connections.set(len(self.connections))
+        self.refresh_state()
+
+    def refresh_state(self) -> None:
+        states = [c.ws_state for c in self.connections] or ["DISCONNECTED"]
+        self.state.ws_state = max(states, key=lambda s: _STATE_RANK.get(s, 2))
+        self.state.subscribed_symbols = set().union(*(c.subscribed for c in self.connections))
+
+    def _check_liveness(self, now: int) -> None:
+        if self.state.force_reconnect:
+            # global request from health_loop: every socket reconnects
+            self.state.force_reconnect = False
+            for conn in self.connections:
+                fresh = conn.last_msg_ts and now - conn.last_msg_ts <= self.liveness_timeout_sec
+                conn.planned_reconnect = bool(fresh)
+                conn.force_reconnect = True
+                conn.changed.set()
+
+        for conn in self.connections:
+            age = max(0, now - conn.last_msg_ts) if conn.last_msg_ts else 0
+            tm_ws_conn_connected.labels(conn=conn.conn_id).set(1 if conn.ws_state == "CONNECTED" else 0)
+            tm_ws_conn_symbols.labels(conn=conn.conn_id).set(len(conn.symbols))
+            tm_ws_conn_last_msg_age_seconds.labels(conn=conn.conn_id).set(age)
+            tm_ws_conn_lag_seconds.labels(conn=conn.conn_id).set(conn.lag_sec)
+            if (
+                conn.ws_state == "CONNECTED"
+                and conn.subscribed
+                and not conn.force_reconnect
+                and age > self.liveness_timeout_sec
+            ):
+                self.log.warning("TM WS[%s] LIVENESS stale %ss, reconnecting", conn.conn_id, age)
+                conn.force_reconnect = True
+                conn.changed.set()
+
+    async def run(self) -> None:
+        if self.tape_path:
+            self.tape = TapeRecorder(self.tape_path)
+            self.log.info("TM recording WS frames to %s", self.tape_path)
+        try:
+            while True:
+                self.state.subscriptions_changed.clear()
+                self.rebalance()
+                await _wait_event(self.state.subscriptions_changed, timeout=1.0)
+                self._check_liveness(int(time.time()))
+                if self.tape is not None:
+                    self.tape.flush()
+        finally:
+            tasks = [c.task for c in self.connections if c.task is not None]
+            for conn in list(self.connections):
+                self._retire(conn)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.tape is not None:
+                self.tape.close()
+
+
+# on_tick does not await unless a position closes, so a worker with a
+# backlog would otherwise hold the loop (WS reads, writer, other shards)
+# until its shard is empty.
+TICK_WORKER_YIELD_EVERY = 64
+
+
+async def tick_worker_loop(
+    state: ManagerState,
+    hit_mode: str,
+    writer: PositionWriter,
+    log,
+    shard: int = 0,
+) -> None:
+    """
+    Evaluate the quotes of one shard. All workers run on the event loop,
+    so they only interleave: every TICK_WORKER_YIELD_EVERY evaluations a
+    busy worker yields, and the other shards and the WS side take turns.
+    """
+    conflator = state.tick_shards[shard]
+    observe_wait = tm_recv_to_eval_seconds.observe
+    count_eval = state.rolling.evals.add
+    streak = 0
+    while True:
+        if not conflator.qsize():
+            streak = 0  # get() suspends anyway
+        elif streak >= TICK_WORKER_YIELD_EVERY:
+            streak = 0
+            await asyncio.sleep(0)
+        streak += 1
+        tick = await conflator.get()
+        started = time.perf_counter()
+        if tick.recv_ts:
+            observe_wait(max(0.0, time.time() - tick.recv_ts))
+        try:
+            await on_tick(state, tick.symbol, tick, hit_mode, writer)
+            count_eval()
         except Exception as exc:
+            state.note_drop()
             tm_exceptions_total.inc()
-            tm_reconnect_total.inc()
-            async with state.global_lock:
-                state.ws_state = "DISCONNECTED"
-                state.subscribed_symbols.clear()
-            delay = backoffs[min(attempt, len(backoffs) - 1)]
-            attempt += 1
-            log.warning("TM WS disconnected (%s), retry in %ss", exc, delay)
-            await asyncio.sleep(delay)
-        else:
-            async with state.global_lock:
-                state.ws_state = "DISCONNECTED"
-                state.subscribed_symbols.clear()
-                state.force_reconnect = False
-            # closed intentionally (e.g. force reconnect)
-            await asyncio.sleep(0)
+            log.warning("TM tick worker error: %s", exc)
+        conflator.busy_sec += time.perf_counter() - started
+
+
+async def ws_loop(
+    state: ManagerState,
+    ws_url: str,
+    hit_mode: str,
+    log,
+    subscribe_batch: int = 10,
+    max_topics_per_conn: int = 200,
+    max_connections: int = 8,
+    liveness_timeout_sec: int = 45,
+    proximity_pct: float = 0.001,
+    tape_path: str = "",
+    writer: PositionWriter | None = None,
+    kline_catchup: bool = True,
+    catchup_concurrency: int = 8,
+) -> None:
+    pool = WsPool(
+        state,
+        ws_url=ws_url,
+        log=log,
+        subscribe_batch=subscribe_batch,
+        max_topics_per_conn=max_topics_per_conn,
+        max_connections=max_connections,
+        liveness_timeout_sec=liveness_timeout_sec,
+        hit_mode=hit_mode,
+        proximity_pct=proximity_pct,
+        tape_path=tape_path,
+        writer=writer,
+        kline_catchup=kline_catchup,
+        catchup_concurrency=catchup_concurrency,
+    )
+    await pool.run()
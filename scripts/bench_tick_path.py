@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+# Allow running as: python scripts/<file>.py
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import websockets
+
+from app.db.trade_manager import Position
+from app.trade_manager.quotes import Quote
+from app.trade_manager.router import on_tick
+from app.trade_manager.state import ManagerState
+from app.trade_manager.writer import PositionWriter
+from app.trade_manager.ws_client import tick_worker_loop, ws_loop
+
+# Tick-path throughput without the live Bybit stream or any DB:
+#  1) on_tick only: evaluations/sec against in-memory positions
+#  2) end-to-end: local WS server -> ws_loop -> shards -> tick workers
+# Positions sit far from price, so no close reaches the (never started) writer,
+# except one sentinel symbol whose SL is crossed by the last frame.
+
+END_SYMBOL = "ZZENDUSDT"
+
+
+def _position(pos_id: int, symbol: str, sl: float, tp: float) -> Position:
+    return Position(
+        id=pos_id,
+        signal_key=f"{symbol}:bench:{pos_id}",
+        symbol=symbol,
+        timeframe="240",
+        signal_date=0,
+        signal_created_at=0,
+        signal_type="BENCH",
+        side="LONG",
+        entry=100.0,
+        sl=sl,
+        tp=tp,
+        opened_at=0,
+        status="OPEN",
+        closed_at=None,
+        close_reason=None,
+        close_price=None,
+    )
+
+
+def _seed(state: ManagerState, symbols: list[str], per_symbol: int) -> None:
+    positions = []
+    for sym in symbols:
+        for _ in range(per_symbol):
+            positions.append(_position(len(positions) + 1, sym, sl=1.0, tp=10_000.0))
+    positions.append(_position(len(positions) + 1, END_SYMBOL, sl=50.0, tp=10_000.0))
+    state.replace_positions_unlocked(positions)
+
+
+def _frame(symbol: str, price: float, ts_ms: int) -> str:
+    return json.dumps(
+        {
+            "topic": f"tickers.{symbol}",
+            "type": "snapshot",
+            "ts": ts_ms,
+            "data": {
+                "symbol": symbol,
+                "lastPrice": f"{price:.4f}",
+                "bid1Price": f"{price - 0.01:.4f}",
+                "ask1Price": f"{price + 0.01:.4f}",
+            },
+        }
+    )
+
+
+async def bench_on_tick(symbols: list[str], per_symbol: int, n: int) -> float:
+    state = ManagerState()
+    _seed(state, symbols, per_symbol)
+    writer = PositionWriter(state, log=logging.getLogger("bench"))
+    quotes = [Quote(s, ts=0, last=100.01, bid=100.0, ask=100.02) for s in (random.choice(symbols) for _ in range(n))]
+    t0 = time.perf_counter()
+    for q in quotes:
+        await on_tick(state, q.symbol, q, "bidask", writer)
+    return n / (time.perf_counter() - t0)
+
+
+async def bench_end_to_end(symbols: list[str], per_symbol: int, n: int, workers: int) -> tuple[float, float]:
+    log = logging.getLogger("bench")
+    state = ManagerState.with_tick_workers(workers)
+    _seed(state, symbols, per_symbol)
+    writer = PositionWriter(state, log=log)
+
+    frames = [_frame(random.choice(symbols), 100.0 + random.random(), 1_700_000_000_000 + i) for i in range(n)]
+    frames.append(_frame(END_SYMBOL, 40.0, 1_700_000_000_000 + n))
+    sent_at: list[float] = []
+
+    async def handler(ws, *_args) -> None:
+        await asyncio.sleep(0.2)  # let subscriptions settle
+        sent_at.append(time.perf_counter())
+        for f in frames:
+            await ws.send(f)
+        await ws.wait_closed()
+
+    async with websockets.serve(handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        # one socket: the server replays every frame on each connection
+        url = f"ws://127.0.0.1:{port}"
+        tasks = [asyncio.create_task(ws_loop(state, url, "bidask", log, max_topics_per_conn=len(symbols) + 1))]
+        tasks += [
+            asyncio.create_task(tick_worker_loop(state, "bidask", writer, log, shard=i))
+            for i in range(len(state.tick_shards))
+        ]
+        while writer.queue.empty():
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - sent_at[0]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    conflated = sum(c.conflated for c in state.tick_shards)
+    return (n + 1) / elapsed, conflated / (n + 1)
+
+
+async def main() -> None:
+    p = argparse.ArgumentParser(description="Trade manager tick-path benchmark")
+    p.add_argument("--symbols", type=int, default=200)
+    p.add_argument("--per-symbol", type=int, default=1)
+    p.add_argument("--ticks", type=int, default=100_000)
+    p.add_argument("--workers", type=int, default=1)
+    args = p.parse_args()
+
+    random.seed(7)
+    symbols = [f"SYM{i:04d}USDT" for i in range(args.symbols)]
+
+    rate = await bench_on_tick(symbols, args.per_symbol, args.ticks)
+    print(f"on_tick: {rate:,.0f} ticks/sec")
+
+    rate, conflated = await bench_end_to_end(symbols, args.per_symbol, args.ticks, args.workers)
+    print(f"ws->workers: {rate:,.0f} frames/sec (conflated {conflated:.1%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+# Allow running as: python scripts/<file>.py
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import asyncio
+import logging
+
+from app.trade_manager.compaction import compact_events_once
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Roll old position_events into one SUMMARY row per position")
+    p.add_argument("--retain-days", type=float, default=7.0, help="keep full events for positions closed since")
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    positions, removed = asyncio.run(compact_events_once(args.retain_days, logging.getLogger("compact")))
+    print(f"✅ Compacted {positions} positions, {removed} event rows removed")
+
+
+if __name__ == "__main__":
+    main()
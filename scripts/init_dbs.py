@@ -96,7 +96,9 @@ CREATE TABLE IF NOT EXISTS signals (
   volume REAL,
   close REAL,
 
-  created_at INTEGER NOT NULL
+  created_at INTEGER NOT NULL,
+
+  dedup_key TEXT                     -- NULL for raw rows, set by idempotent inserts
 );
 
 CREATE INDEX IF NOT EXISTS idx_signals_lookup
@@ -104,6 +106,9 @@ CREATE INDEX IF NOT EXISTS idx_signals_lookup
 
 CREATE INDEX IF NOT EXISTS idx_signals_created_at
   ON signals(created_at);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_signals_dedup_key
+  ON signals(dedup_key);
 """
 
 
@@ -128,6 +133,9 @@ CREATE TABLE IF NOT EXISTS virtual_positions (
   hit_source TEXT,
   last_tick_ts INTEGER,
   last_tick_price REAL,
+  mae_pct REAL,                      -- worst PnL % of entry while open
+  mfe_pct REAL,                      -- best PnL % of entry while open
+  upnl_pct REAL,                     -- PnL % at the last flush (close price once CLOSED)
   meta_json TEXT,
   created_at INTEGER NOT NULL,
   updated_at INTEGER NOT NULL
@@ -146,6 +154,20 @@ CREATE TABLE IF NOT EXISTS position_events (
   FOREIGN KEY (pos_id) REFERENCES virtual_positions(id)
 );
 
+CREATE TABLE IF NOT EXISTS trade_stats (
+  day TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  signal_type TEXT NOT NULL,
+  side TEXT NOT NULL,
+  trades INTEGER NOT NULL,
+  wins INTEGER NOT NULL,
+  losses INTEGER NOT NULL,
+  r_sum REAL NOT NULL,
+  pnl_pct_sum REAL NOT NULL,
+  updated_at INTEGER NOT NULL,
+  PRIMARY KEY(day, symbol, signal_type, side)
+);
+
 CREATE TABLE IF NOT EXISTS manager_state (
   k TEXT PRIMARY KEY,
   v TEXT NOT NULL,
@@ -160,6 +182,10 @@ CREATE INDEX IF NOT EXISTS idx_vp_opened_at
   ON virtual_positions(opened_at);
 CREATE INDEX IF NOT EXISTS idx_events_ts
   ON position_events(ts);
+CREATE INDEX IF NOT EXISTS idx_events_pos_ts
+  ON position_events(pos_id, ts);
+CREATE INDEX IF NOT EXISTS idx_events_type_ts
+  ON position_events(event_type, ts);
 """
 
 
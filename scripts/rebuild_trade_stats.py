@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+# Allow running as: python scripts/<file>.py
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import asyncio
+
+from app.db.trade_manager import connect, ensure_schema, rebuild_trade_stats
+
+# Recompute trade_stats from virtual_positions history, e.g. after the table
+# was first added or after editing closed positions by hand.
+
+
+async def run() -> int:
+    conn = await connect()
+    try:
+        await ensure_schema(conn)
+        rows = await rebuild_trade_stats(conn)
+        await conn.commit()
+    finally:
+        await conn.close()
+    return rows
+
+
+def main() -> None:
+    rows = asyncio.run(run())
+    print(f"✅ Rebuilt trade_stats: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
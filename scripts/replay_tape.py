@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+# Allow running as: python scripts/<file>.py
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import tempfile
+import time
+from typing import Iterator
+
+import websockets
+
+from app.db.trade_manager import connect, ensure_schema, insert_virtual_positions_from_signals
+from app.metrics_tm import tm_conflated_ticks_total, tm_quiet_ticks_total, tm_ws_conn_messages_total
+from app.trade_manager.state import ManagerState
+from app.trade_manager.tape import read_tape, write_tape
+from app.trade_manager.writer import CloseRequest, PositionWriter
+from app.trade_manager.ws_client import WsPool, tick_worker_loop
+
+# Replay a recorded tick tape (TM_TAPE_PATH) or synthetic ticker frames through
+# the real trade manager path: local WS stand-in -> WsPool -> shards -> tick
+# workers -> PositionWriter on a scratch trade_manager.db.
+#
+#   python scripts/replay_tape.py --tape logs/ticks.tape --speed 10
+#   python scripts/replay_tape.py --synthetic --symbols 50 --ticks 100000 --speed 0
+#
+# One position per symbol is opened at the first price seen, alternating
+# LONG/SHORT, with SL/TP --sl-pct/--tp-pct away. --speed 0 sends as fast as
+# the loop allows.
+
+
+def synthetic_frames(symbols: int, ticks: int, rate: float, seed: int = 7) -> Iterator[tuple[int, bytes]]:
+    """Random-walk Bybit ticker frames: one snapshot per symbol, then deltas."""
+    rng = random.Random(seed)
+    names = [f"SYN{i:04d}USDT" for i in range(symbols)]
+    prices = {s: rng.uniform(1.0, 1000.0) for s in names}
+    t0_ns = time.time_ns()
+    step_ns = int(1e9 / rate) if rate > 0 else 1_000_000
+
+    def frame(kind: str, data: dict, ts_ns: int) -> bytes:
+        msg = {"topic": f"tickers.{data['symbol']}", "type": kind, "ts": ts_ns // 1_000_000, "data": data}
+        return json.dumps(msg, separators=(",", ":")).encode()
+
+    for i in range(ticks):
+        ts_ns = t0_ns + i * step_ns
+        if i < symbols:
+            s = names[i]
+            p = prices[s]
+            data = {
+                "symbol": s,
+                "lastPrice": f"{p:.6f}",
+                "bid1Price": f"{p * 0.9999:.6f}",
+                "ask1Price": f"{p * 1.0001:.6f}",
+                "volume24h": "0",
+            }
+            yield ts_ns, frame("snapshot", data, ts_ns)
+            continue
+
+        s = rng.choice(names)
+        roll = rng.random()
+        if roll < 0.2:
+            # funding/volume-only delta: no price to evaluate
+            yield ts_ns, frame("delta", {"symbol": s, "volume24h": str(i)}, ts_ns)
+            continue
+        p = prices[s] = prices[s] * (1.0 + rng.gauss(0.0, 0.0005))
+        data = {"symbol": s, "bid1Price": f"{p * 0.9999:.6f}", "ask1Price": f"{p * 1.0001:.6f}"}
+        if roll < 0.6:
+            data["lastPrice"] = f"{p:.6f}"
+        yield ts_ns, frame("delta", data, ts_ns)
+
+
+def _index_frames(frames: list[tuple[int, bytes]]) -> tuple[list[tuple[int, str, bytes]], dict[str, float]]:
+    """(recv_ts_ns, topic, raw) per ticker frame, plus the first price per symbol."""
+    out: list[tuple[int, str, bytes]] = []
+    first_price: dict[str, float] = {}
+    for ts_ns, raw in frames:
+        msg = json.loads(raw)
+        topic = msg.get("topic", "")
+        if not topic.startswith("tickers."):
+            continue
+        out.append((ts_ns, topic, raw))
+        data = msg.get("data") or {}
+        symbol = data.get("symbol")
+        price = data.get("lastPrice") or data.get("bid1Price")
+        if symbol and price and symbol not in first_price:
+            first_price[symbol] = float(price)
+    return out, first_price
+
+
+def _counter_total(metric) -> float:
+    return sum(s.value for m in metric.collect() for s in m.samples if s.name.endswith("_total"))
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class _LatencyWriter(PositionWriter):
+    """PositionWriter that records receive->commit latency per close."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+
+    async def _write(self, conn, batch: list[CloseRequest]) -> None:
+        await super()._write(conn, batch)
+        now = time.time()
+        self.latencies.extend(now - req.recv_ts for req in batch if req.recv_ts)
+
+
+async def _seed_positions(db_path: Path, first_price: dict[str, float], sl_pct: float, tp_pct: float):
+    now = int(time.time())
+    signals = []
+    for i, (symbol, price) in enumerate(sorted(first_price.items())):
+        side = "LONG" if i % 2 == 0 else "SHORT"
+        sign = 1.0 if side == "LONG" else -1.0
+        signals.append(
+            {
+                "id": i + 1,
+                "symbol": symbol,
+                "timeframe": "240",
+                "date": now,
+                "created_at": now,
+                "signal_type": "REPLAY",
+                "side": side,
+                "entry": price,
+                "stop": price * (1.0 - sign * sl_pct / 100.0),
+                "tp": price * (1.0 + sign * tp_pct / 100.0),
+            }
+        )
+    conn = await connect(db_path)
+    try:
+        await ensure_schema(conn)
+        positions = await insert_virtual_positions_from_signals(conn, signals)
+        await conn.commit()
+    finally:
+        await conn.close()
+    return positions
+
+
+async def replay(frames: list[tuple[int, bytes]], args: argparse.Namespace) -> None:
+    log = logging.getLogger("replay")
+    indexed, first_price = _index_frames(frames)
+    if not indexed:
+        print("no ticker frames to replay")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "trade_manager.db"
+        positions = await _seed_positions(db_path, first_price, args.sl_pct, args.tp_pct)
+
+        state = ManagerState.with_tick_workers(args.workers)
+        state.replace_positions_unlocked(positions)
+        writer = _LatencyWriter(state, log=log, db_path=db_path)
+
+        # topic -> socket, honouring subscribe/unsubscribe like the exchange does
+        routes: dict[str, object] = {}
+
+        async def handler(ws, *_args) -> None:
+            try:
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    for topic in msg.get("args", []):
+                        if msg.get("op") == "subscribe":
+                            routes[topic] = ws
+                        elif routes.get(topic) is ws:
+                            del routes[topic]
+            finally:
+                for topic in [t for t, w in routes.items() if w is ws]:
+                    del routes[topic]
+
+        conflated0 = _counter_total(tm_conflated_ticks_total)
+        quiet0 = _counter_total(tm_quiet_ticks_total)
+        received0 = _counter_total(tm_ws_conn_messages_total)
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            pool = WsPool(
+                state,
+                ws_url=f"ws://127.0.0.1:{port}",
+                log=log,
+                hit_mode=args.mode,
+                proximity_pct=args.proximity_pct,
+            )
+            tasks = [asyncio.create_task(pool.run()), asyncio.create_task(writer.run())]
+            tasks += [
+                asyncio.create_task(tick_worker_loop(state, args.mode, writer, log, shard=i))
+                for i in range(len(state.tick_shards))
+            ]
+
+            wanted = {f"tickers.{s}" for s in state.desired_subscriptions_unlocked()}
+            deadline = time.monotonic() + 5.0
+            while not wanted <= routes.keys() and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+
+            sent = unrouted = 0
+            first_ns = indexed[0][0]
+            t0 = time.perf_counter()
+            for ts_ns, topic, raw in indexed:
+                if args.speed > 0:
+                    delay = (ts_ns - first_ns) / 1e9 / args.speed - (time.perf_counter() - t0)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                ws = routes.get(topic)
+                if ws is None:
+                    unrouted += 1  # symbol already closed and unsubscribed
+                    continue
+                try:
+                    await ws.send(raw.decode())
+                    sent += 1
+                except websockets.ConnectionClosed:
+                    unrouted += 1
+
+            # drain: receive side settles, shards empty, writer caught up
+            last = -1.0
+            while True:
+                await asyncio.sleep(0.2)
+                received = _counter_total(tm_ws_conn_messages_total) - received0
+                if received == last and not any(s.qsize() for s in state.tick_shards):
+                    break
+                last = received
+            await writer.queue.join()
+            elapsed = time.perf_counter() - t0
+
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    received = _counter_total(tm_ws_conn_messages_total) - received0
+    lat_ms = [x * 1000.0 for x in writer.latencies]
+    print(f"frames: {len(indexed):,} on tape, {sent:,} sent, {unrouted:,} unrouted, {received:,.0f} received")
+    print(f"throughput: {received / elapsed:,.0f} ticks/sec over {elapsed:.2f}s (speed {args.speed or 'max'})")
+    print(f"drops: {sent - received:,.0f} lost in transport")
+    print(
+        f"skipped: {_counter_total(tm_conflated_ticks_total) - conflated0:,.0f} conflated, "
+        f"{_counter_total(tm_quiet_ticks_total) - quiet0:,.0f} quiet"
+    )
+    print(f"closes: {len(lat_ms)} of {len(positions)} positions")
+    if lat_ms:
+        print(
+            f"tick->close latency ms: p50={_pct(lat_ms, 0.5):.2f} p99={_pct(lat_ms, 0.99):.2f} max={max(lat_ms):.2f}"
+        )
+
+
+async def main() -> None:
+    p = argparse.ArgumentParser(description="Replay a tick tape through the trade manager")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--tape", help="tape recorded with TM_TAPE_PATH")
+    src.add_argument("--synthetic", action="store_true", help="generate random-walk ticker frames")
+    p.add_argument("--symbols", type=int, default=50)
+    p.add_argument("--ticks", type=int, default=100_000)
+    p.add_argument("--rate", type=float, default=5_000.0, help="synthetic frames/sec at 1x")
+    p.add_argument("--save-tape", help="also write the synthetic frames to this tape")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier, 0 = unpaced")
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--mode", choices=["bidask", "last_price"], default="bidask")
+    p.add_argument("--proximity-pct", type=float, default=0.001)
+    p.add_argument("--sl-pct", type=float, default=1.0)
+    p.add_argument("--tp-pct", type=float, default=1.0)
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    if args.tape:
+        frames = list(read_tape(args.tape))
+    else:
+        frames = list(synthetic_frames(args.symbols, args.ticks, args.rate))
+        if args.save_tape:
+            write_tape(args.save_tape, iter(frames))
+            print(f"wrote {len(frames):,} frames to {args.save_tape}")
+
+    await replay(frames, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
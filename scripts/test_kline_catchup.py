@@ -0,0 +1,92 @@
+import asyncio
+import logging
+
+from app.db.trade_manager import Position
+from app.trade_manager.catchup import kline_catchup, sweep_klines
+from app.trade_manager.quotes import Quote
+from app.trade_manager.state import ManagerState
+from app.trade_manager.triggers import TriggerIndex
+
+log = logging.getLogger("test_kline_catchup")
+
+T0 = 1_700_000_070  # outage start, 30s into a minute
+
+
+def pos(pos_id, symbol, side, sl, tp, opened_at=T0 - 3600):
+    return Position(
+        pos_id, f"k{pos_id}", symbol, "240", 0, 0, "BREAKOUT_T2", side, 100.0, sl, tp, opened_at, "OPEN", None, None, None
+    )
+
+
+def kline(start_s, low, high):
+    return {"start": start_s * 1000, "low": low, "high": high}
+
+
+class FakeREST:
+    def __init__(self, klines):
+        self.klines = klines
+        self.calls = []
+
+    async def get_kline(self, symbol, interval, limit, start, end):
+        self.calls.append((symbol, interval, limit, start, end))
+        if symbol not in self.klines:
+            raise RuntimeError("boom")
+        return [k for k in self.klines[symbol] if start <= k["start"] <= end]
+
+    async def close(self):
+        pass
+
+
+class FakeWriter:
+    def __init__(self):
+        self.closes = []
+
+    def submit_close(self, req):
+        self.closes.append(req)
+
+
+async def main():
+    # the minute the outage started in was partly seen live: skipped
+    minute = T0 // 60 * 60
+    index = TriggerIndex([pos(1, "AAAUSDT", "LONG", 90, 110)])
+    hits = sweep_klines(index, [kline(minute, 85, 100), kline(minute + 60, 99, 111)], not_before_ms=(minute + 60) * 1000)
+    print("sweep:", [(p.id, r, px, ts) for p, r, px, ts in hits])
+    assert [(p.id, r, px) for p, r, px, _ in hits] == [(1, "TP", 110.0)]
+
+    # positions opened after a kline started are not closed by it
+    late = TriggerIndex([pos(2, "AAAUSDT", "LONG", 90, 110, opened_at=minute + 90)])
+    assert sweep_klines(late, [kline(minute + 60, 85, 100)]) == []
+
+    # bidask: TP needs the spread on top of the last-price high
+    tp_only = TriggerIndex([pos(3, "AAAUSDT", "LONG", 50, 110), pos(4, "AAAUSDT", "SHORT", 150, 90)])
+    ks = [kline(minute + 60, 89.95, 110.05)]
+    assert sweep_klines(tp_only, ks, spread=0.1) == []
+    assert len(sweep_klines(tp_only, ks, spread=0.03)) == 2
+    print("spread-adjusted TPs ok")
+
+    state = ManagerState()
+    state.replace_positions_unlocked(
+        [pos(10, "AAAUSDT", "LONG", 90, 110), pos(11, "BBBUSDT", "SHORT", 110, 90), pos(12, "CCCUSDT", "LONG", 90, 110)]
+    )
+    state.last_quote_by_symbol["AAAUSDT"] = Quote("AAAUSDT", last=100.0, bid=99.99, ask=100.01)
+    rest = FakeREST(
+        {
+            "AAAUSDT": [kline(minute + 60, 95, 105), kline(minute + 120, 89, 100)],
+            "BBBUSDT": [kline(minute + 60, 85, 100)],  # TP, but no quote -> unknown spread
+        }
+    )
+    writer = FakeWriter()
+    n = await kline_catchup(state, {"AAAUSDT", "BBBUSDT", "CCCUSDT", "ZZZUSDT"}, T0, T0 + 300, writer, log, client=rest, hit_mode="bidask")
+    print("catch-up closes:", n, [(r.position.id, r.close_reason, r.close_price, r.hit_source) for r in writer.closes])
+    print("REST calls:", rest.calls)
+    assert [(r.position.id, r.close_reason) for r in writer.closes] == [(10, "SL")]
+    assert sorted(state.open_positions_by_symbol) == ["BBBUSDT", "CCCUSDT"]
+    assert all(c[3] == (minute + 60) * 1000 for c in rest.calls)
+
+    writer = FakeWriter()
+    n = await kline_catchup(state, {"BBBUSDT"}, T0, T0 + 300, writer, log, client=rest, hit_mode="last_price")
+    print("last_price mode closes:", n)
+    assert n == 1 and writer.closes[0].close_reason == "TP"
+
+
+asyncio.run(main())
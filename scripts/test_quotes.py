@@ -0,0 +1,70 @@
+import asyncio
+
+from app.db.trade_manager import Position
+from app.trade_manager.conflate import TickConflator
+from app.trade_manager.excursions import ExcursionBook
+from app.trade_manager.quotes import Quote
+
+
+async def main():
+    # deltas keep the fields they do not carry; lo/hi cover the whole window
+    q = Quote("TESTUSDT")
+    q.apply({"lastPrice": "100", "bid1Price": "99.9", "ask1Price": "100.1"}, ts=1)
+    q.apply({"bid1Price": "98.5"}, ts=2)
+    q.apply({"lastPrice": "101", "ask1Price": "101.2"}, ts=3)
+    assert not q.apply({"lastPrice": "101"}, ts=4)
+    print("quote:", q.as_dict(), "bid window:", q.bid_lo, q.bid_hi)
+    assert (q.bid, q.bid_lo, q.bid_hi) == (98.5, 98.5, 99.9)
+    assert q.ts == 3
+
+    snap = q.take()
+    assert (snap.last_lo, snap.last_hi) == (100.0, 101.0)
+    assert (q.last_lo, q.last_hi) == (101.0, 101.0)
+    print("take ok")
+
+    # a symbol is queued once until taken; later frames land in the same Quote
+    conflator = TickConflator()
+    a, b = Quote("AAAUSDT"), Quote("BBBUSDT")
+    a.apply({"lastPrice": "1"}, ts=1)
+    print("put a:", conflator.put(a))
+    b.apply({"lastPrice": "2"}, ts=1)
+    conflator.put(b)
+    a.apply({"lastPrice": "0.5"}, ts=2)
+    print("put a again (conflated):", conflator.put(a))
+    assert conflator.qsize() == 2 and conflator.conflated == 1
+
+    first = await conflator.get()
+    second = await conflator.get()
+    print("taken:", first.symbol, (first.last_lo, first.last_hi), second.symbol)
+    assert (first.symbol, first.last_lo, first.last_hi) == ("AAAUSDT", 0.5, 1.0)
+    assert second.symbol == "BBBUSDT" and conflator.qsize() == 0
+
+    waiter = asyncio.create_task(conflator.get())
+    await asyncio.sleep(0)
+    conflator.put(a)
+    assert (await asyncio.wait_for(waiter, 1)).symbol == "AAAUSDT"
+    print("get wakes on put")
+
+    # MAE/MFE: observe widens the symbol window, fold applies it
+    long = Position(1, "k1", "TESTUSDT", "240", 0, 0, "BREAKOUT_T2", "LONG", 100.0, 90.0, 120.0, 0, "OPEN", None, None, None)
+    book = ExcursionBook(hit_mode="last_price")
+    for px in (100, 95, 104, 101):
+        t = Quote("TESTUSDT", ts=px, last=float(px))
+        book.observe(t)
+    book.fold("TESTUSDT", [long])
+    exc = book.by_pos[1]
+    print("excursion:", exc.as_list())
+    assert (exc.mae_pct, exc.mfe_pct, exc.upnl_pct) == (-5.0, 4.0, 1.0)
+    assert book.take_dirty({1}) == [(1, -5.0, 4.0, 1.0, 101.0, 101)]
+    assert book.take_dirty({1}) == []
+
+    done = book.finish(long, 90.0, 200)
+    assert 1 not in book.by_pos and done.mae_pct == -10.0
+    book.restore(long, done)
+    assert book.take_dirty({1})[0][1] == -10.0
+    book.mark_dirty([1])
+    assert len(book.take_dirty({1})) == 1
+    print("finish/restore/mark_dirty ok")
+
+
+asyncio.run(main())
@@ -0,0 +1,21 @@
+from app.trade_manager.rolling import RollingCounter
+
+c = RollingCounter()
+t0 = 1_700_000_000
+c.add(1, t0)
+c.add(2, t0)
+c.add(5, t0 + 120)  # 2 minutes later
+c.add(10, t0 + 600)
+
+totals = c.totals(t0 + 600)
+print("totals at +600s:", totals)
+assert totals == {"1m": 10, "5m": 10, "15m": 18}, totals
+
+# a bucket from a previous lap of the ring is reset, not added to
+c.add(1, t0 + 900)
+totals = c.totals(t0 + 900)
+print("totals at +900s:", totals)
+assert totals == {"1m": 1, "5m": 1, "15m": 16}, totals
+
+print("empty after horizon:", c.totals(t0 + 10_000))
+assert c.totals(t0 + 10_000) == {"1m": 0, "5m": 0, "15m": 0}
@@ -34,6 +34,20 @@ async def main():
     )
     print("inserted_again:", inserted2)
 
+    # Idempotent mode skips the same (symbol, timeframe, date, signal_type)
+    inserted3 = await insert_signal(
+        symbol=sym,
+        timeframe=tf,
+        date=date,
+        signal_type="BREAKOUT_T2",
+        side="LONG",
+        entry=100,
+        stop=90,
+        tp=120,
+        idempotent=True,
+    )
+    print("inserted_idempotent:", inserted3)
+
     recent = await get_recent_signals(limit=20)
     print("recent_signals:", recent)
 
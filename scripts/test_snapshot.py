@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+from app.db.trade_manager import close_position_atomic, connect, ensure_schema, insert_virtual_positions_from_signals
+from app.trade_manager.ingest import sync_open_positions_cache
+from app.trade_manager.quotes import Quote
+from app.trade_manager.snapshot import restore_snapshot, write_snapshot
+from app.trade_manager.state import ManagerState
+
+log = logging.getLogger("test_snapshot")
+
+
+def signal(signal_id, symbol):
+    return {
+        "id": signal_id,
+        "symbol": symbol,
+        "timeframe": "240",
+        "date": 1700000000 + signal_id,
+        "signal_type": "BREAKOUT_T2",
+        "side": "LONG",
+        "entry": 100.0,
+        "stop": 90.0,
+        "tp": 120.0,
+        "created_at": 1700000000,
+    }
+
+
+async def main():
+    tmp = Path(tempfile.mkdtemp())
+    path = tmp / "tm_snapshot.json"
+    conn = await connect(tmp / "trade_manager.db")
+    await ensure_schema(conn)
+    await insert_virtual_positions_from_signals(conn, [signal(1, "AAAUSDT"), signal(2, "BBBUSDT")])
+    await conn.commit()
+
+    state = ManagerState()
+    await sync_open_positions_cache(state, conn)
+    q = Quote("AAAUSDT", ts=1700000100)
+    q.apply({"lastPrice": "97", "bid1Price": "96.9", "ask1Price": "97.1"}, ts=1700000100)
+    state.last_quote_by_symbol["AAAUSDT"] = q
+    state.excursions.observe(q)
+    state.last_heartbeat_ts = 1700000100
+    await write_snapshot(state, path)
+    print("snapshot bytes:", path.stat().st_size)
+
+    # while "down": AAA closed by another process, CCC opened
+    aaa = state.positions_for("AAAUSDT")[0]
+    await close_position_atomic(conn, aaa.id, "SL", 90.0, "bidask", 1700000200)
+    await insert_virtual_positions_from_signals(conn, [signal(3, "CCCUSDT")])
+    await conn.commit()
+
+    restored = ManagerState()
+    assert await restore_snapshot(restored, path, log, conn)
+    print("restored symbols:", sorted(restored.open_positions_by_symbol))
+    assert sorted(restored.open_positions_by_symbol) == ["BBBUSDT", "CCCUSDT"]
+    assert restored.positions_for("BBBUSDT") == state.positions_for("BBBUSDT")
+    assert restored.last_heartbeat_ts == 1700000100
+
+    rq = restored.last_quote_by_symbol["AAAUSDT"]
+    print("restored quote:", rq.as_dict(), "window:", rq.bid_lo, rq.bid_hi)
+    assert (rq.last, rq.bid, rq.ask) == (97.0, 96.9, 97.1)
+    assert rq.bid_lo is None and rq.last_lo is None  # never evaluated before a fresh frame
+
+    # a snapshot of another shape is ignored, not half-loaded
+    path.write_text('{"v": 0}')
+    assert not await restore_snapshot(ManagerState(), path, log, conn)
+    assert not await restore_snapshot(ManagerState(), tmp / "missing.json", log, conn)
+    print("unusable snapshots rejected")
+    await conn.close()
+
+
+asyncio.run(main())
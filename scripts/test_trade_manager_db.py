@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+
+from app.db.trade_manager import (
+    compact_position_events,
+    connect,
+    ensure_schema,
+    get_cursor,
+    load_open_positions,
+    rebuild_trade_stats,
+)
+from app.trade_manager.ingest import _ingest_handoff
+from app.trade_manager.state import ManagerState
+from app.trade_manager.writer import CloseRequest, PositionWriter
+from app.timeutil import now_utc_s
+
+log = logging.getLogger("test_trade_manager_db")
+
+
+def signal(signal_id, symbol, side="LONG", entry=100.0, stop=90.0, tp=120.0):
+    return {
+        "id": signal_id,
+        "symbol": symbol,
+        "timeframe": "240",
+        "date": 1700000000 + signal_id,
+        "signal_type": "BREAKOUT_T2",
+        "side": side,
+        "entry": entry,
+        "stop": stop,
+        "tp": tp,
+        "created_at": 1700000000,
+    }
+
+
+async def stats(conn):
+    cur = await conn.execute(
+        "SELECT day, symbol, signal_type, side, trades, wins, losses, round(r_sum, 9), round(pnl_pct_sum, 9)"
+        " FROM trade_stats ORDER BY 1, 2, 3, 4"
+    )
+    return [tuple(r) for r in await cur.fetchall()]
+
+
+async def main():
+    tmp = Path(tempfile.mkdtemp())
+    db_path = tmp / "trade_manager.db"
+    conn = await connect(db_path)
+    await ensure_schema(conn)
+    await conn.commit()
+    state = ManagerState()
+
+    # handoff: rows continuing the cursor are opened without signals.db
+    cursor = await _ingest_handoff(state, [signal(2, "BBBUSDT", "SHORT", 100, 110, 80), signal(1, "AAAUSDT")], log, conn)
+    print("handoff 1..2 -> cursor:", cursor, "open:", state.open_count())
+    assert cursor == 2 and await get_cursor(conn) == 2 and state.open_count() == 2
+
+    cursor = await _ingest_handoff(state, [signal(4, "CCCUSDT")], log, conn)
+    print("handoff 4 (gap) ->", cursor)
+    assert cursor is None and await get_cursor(conn) == 2 and state.open_count() == 2
+
+    cursor = await _ingest_handoff(state, [signal(2, "BBBUSDT")], log, conn)
+    assert cursor == 2 and state.open_count() == 2
+    cursor = await _ingest_handoff(state, [signal(3, "CCCUSDT"), signal(4, "DDDUSDT"), signal(5, "EEEUSDT")], log, conn)
+    print("handoff 3..5 ->", cursor, "open:", state.open_count())
+    assert cursor == 5 and state.open_count() == 5
+
+    # writer: closes queued together share one commit
+    writer = PositionWriter(state, log, db_path=db_path)
+    task = asyncio.create_task(writer.run())
+    positions = {p.symbol: p for p in await load_open_positions(conn)}
+    closes = [("AAAUSDT", "TP", 120.0), ("BBBUSDT", "SL", 110.0), ("CCCUSDT", "SL", 90.0)]
+    async with state.global_lock:
+        for symbol, _, _ in closes:
+            state.remove_positions_unlocked(symbol, {positions[symbol].id})
+    for symbol, reason, price in closes:
+        p = positions[symbol]
+        writer.submit_close(
+            CloseRequest(p, reason, price, "bidask", now_utc_s(), excursion=state.excursions.finish(p, price, 0))
+        )
+    await writer.queue.join()
+    open_left = {p.symbol for p in await load_open_positions(conn)}
+    print("after group commit, open:", sorted(open_left))
+    assert open_left == {"DDDUSDT", "EEEUSDT"}
+
+    # a second close of the same position is a no-op (already CLOSED)
+    writer.submit_close(CloseRequest(positions["AAAUSDT"], "TP", 120.0, "bidask", now_utc_s()))
+    await writer.queue.join()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    # per-close trade_stats upsert matches a rebuild from history
+    incremental = await stats(conn)
+    rebuilt_rows = await rebuild_trade_stats(conn)
+    await conn.commit()
+    print("trade_stats:", incremental)
+    assert rebuilt_rows == len(incremental) and await stats(conn) == incremental
+    assert sum(r[4] for r in incremental) == 3
+
+    # _restore puts failed closes back in the cache with their excursion
+    p = positions["DDDUSDT"]
+    async with state.global_lock:
+        state.remove_positions_unlocked("DDDUSDT", {p.id})
+    exc = state.excursions.finish(p, 95.0, 0)
+    await writer._restore([CloseRequest(p, "SL", 95.0, "bidask", 0, excursion=exc)])
+    print("restored:", [x.id for x in state.positions_for("DDDUSDT")], state.excursions.by_pos[p.id].as_list())
+    assert state.positions_for("DDDUSDT") == (p,) and state.excursions.by_pos[p.id].dirty
+    assert [x.id for x, _, _ in state.triggers_by_symbol["DDDUSDT"].crossed(89, 89, None, None)] == [p.id]
+
+    # closed positions' events roll up into one SUMMARY row each
+    await conn.execute("INSERT INTO position_events(pos_id, ts, event_type) VALUES (?, ?, 'TICK')", (positions["AAAUSDT"].id, 1))
+    n, removed = await compact_position_events(conn, closed_before=now_utc_s() + 1)
+    await conn.commit()
+    cur = await conn.execute("SELECT pos_id, event_type, payload_json FROM position_events ORDER BY pos_id, id")
+    events = [tuple(r) for r in await cur.fetchall()]
+    print("compacted:", n, "removed:", removed)
+    for e in events:
+        print("  ", e)
+    assert n == 3 and removed == 4
+    assert [e[1] for e in events if e[0] == positions["AAAUSDT"].id] == ["SUMMARY"]
+    assert [e[1] for e in events if e[0] == positions["DDDUSDT"].id] == ["OPENED"]
+    assert await compact_position_events(conn, closed_before=now_utc_s() + 1) == (0, 0)
+
+    await conn.close()
+
+
+asyncio.run(main())
@@ -0,0 +1,83 @@
+import random
+
+from app.db.trade_manager import Position
+from app.trade_manager.evaluator import evaluate_hit, evaluate_index
+from app.trade_manager.quotes import Quote
+from app.trade_manager.triggers import TriggerIndex
+
+
+def pos(pos_id, side, sl, tp, symbol="TESTUSDT"):
+    entry = (sl + tp) / 2
+    return Position(
+        pos_id, f"k{pos_id}", symbol, "240", 0, 0, "BREAKOUT_T2", side, entry, sl, tp, 0, "OPEN", None, None, None
+    )
+
+
+def window(lo, hi, spread=0.0):
+    q = Quote("TESTUSDT")
+    q.apply({"lastPrice": lo, "bid1Price": lo, "ask1Price": lo + spread}, ts=1)
+    q.apply({"lastPrice": hi, "bid1Price": hi, "ask1Price": hi + spread}, ts=2)
+    return q
+
+
+def main() -> None:
+    positions = [
+        pos(1, "LONG", 90, 110),
+        pos(2, "LONG", 95, 120),
+        pos(3, "SHORT", 110, 90),
+        pos(4, "SHORT", 105, 80),
+    ]
+    index = TriggerIndex(positions)
+    print("bounds:", index.long_floor, index.long_ceil, index.short_floor, index.short_ceil)
+
+    hits = index.crossed(94, 104, 94, 104)
+    print("crossed 94..104:", [(p.id, r, px) for p, r, px in hits])
+    assert {(p.id, r) for p, r, _ in hits} == {(2, "SL")}
+
+    # both levels of pos 2 in one window: SL wins
+    hits = index.crossed(94, 121, None, None)
+    print("crossed 94..121 (longs):", [(p.id, r, px) for p, r, px in hits])
+    assert {(p.id, r) for p, r, _ in hits} == {(1, "TP"), (2, "SL")}, hits
+
+    assert not index.near(100, 100, 100, 100)
+    assert index.near(96, 100, 100, 100, margin=0.02)
+    print("near ok")
+
+    index.discard([2])
+    print("after discard(2):", index.long_floor)
+    assert index.long_floor == 90
+    assert index.crossed(94, 104, 94, 104) == []
+
+    # evaluate_index must agree with evaluate_hit position by position
+    rng = random.Random(7)
+    for _ in range(2000):
+        ps = []
+        for i in range(rng.randint(1, 8)):
+            side = rng.choice(["LONG", "SHORT"])
+            lo, hi = sorted(rng.uniform(80, 120) for _ in range(2))
+            ps.append(pos(i + 1, side, lo, hi) if side == "LONG" else pos(i + 1, side, hi, lo))
+        idx = TriggerIndex(ps)
+        dead = {p.id for p in ps if rng.random() < 0.2}
+        idx.discard(dead)
+        lo, hi = sorted(rng.uniform(75, 125) for _ in range(2))
+        q = window(lo, hi, spread=rng.choice([0.0, 0.5]))
+        for mode in ("bidask", "last_price"):
+            got = {p.id: r for p, r in evaluate_index(idx, q, mode)}
+            want = {}
+            for p in ps:
+                if p.id in dead:
+                    continue
+                r = evaluate_hit(p, q, mode)
+                if r.should_close:
+                    want[p.id] = r
+            assert got == want, (mode, got, want)
+
+    # a restored quote (prices, no window) is never evaluated
+    restored = Quote("TESTUSDT", ts=1)
+    restored.last, restored.bid, restored.ask = 50.0, 50.0, 50.1
+    assert evaluate_index(TriggerIndex(positions), restored, "bidask") == []
+    print("evaluate_index == evaluate_hit on 2000 random cases")
+
+
+if __name__ == "__main__":
+    main()